@@ -2,55 +2,64 @@
 Quick script to check what data is actually in Neo4j database
 """
 
-from neo4j import GraphDatabase
-from medical_agent.config import Config
+import asyncio
+from medical_agent.graph.driver import get_async_driver, close_async_driver
 
-def check_database():
-    driver = GraphDatabase.driver(
-        Config.NEO4J_URI,
-        auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD)
+async def check_database():
+    driver = get_async_driver()
+    
+    # Count nodes per label and relationships per type; the two queries are
+    # independent, so run them concurrently (execute_query uses its own session)
+    label_result, rel_result = await asyncio.gather(
+        driver.execute_query("""
+            MATCH (n)
+            UNWIND labels(n) AS label
+            RETURN label, count(*) AS count
+        """),
+        driver.execute_query("""
+            MATCH ()-[r]->()
+            RETURN type(r) AS relationshipType, count(*) AS count
+        """)
     )
     
-    with driver.session() as session:
+    async with driver.session() as session:
         print("=" * 80)
         print("NEO4J DATABASE CONTENTS")
         print("=" * 80)
         
-        # Check node labels
-        result = session.run("CALL db.labels()")
-        labels = [record["label"] for record in result]
-        print(f"\n📊 Node Labels: {labels}")
-        
-        # Count nodes by label
-        for label in labels:
-            result = session.run(f"MATCH (n:{label}) RETURN count(n) as count")
-            count = result.single()["count"]
+        label_counts = {record[0]: record[1] for record in label_result.records}
+        print(f"\n📊 Node Labels: {list(label_counts)}")
+        for label, count in label_counts.items():
             print(f"   - {label}: {count} nodes")
         
-        # Check relationships
-        result = session.run("CALL db.relationshipTypes()")
-        rel_types = [record["relationshipType"] for record in result]
-        print(f"\n🔗 Relationship Types: {rel_types}")
-        
-        # Count relationships
-        for rel_type in rel_types:
-            result = session.run(f"MATCH ()-[r:{rel_type}]->() RETURN count(r) as count")
-            count = result.single()["count"]
+        rel_counts = {record[0]: record[1] for record in rel_result.records}
+        print(f"\n🔗 Relationship Types: {list(rel_counts)}")
+        for rel_type, count in rel_counts.items():
             print(f"   - {rel_type}: {count} relationships")
         
         # Sample Entity nodes
         print("\n" + "=" * 80)
         print("SAMPLE ENTITY NODES")
         print("=" * 80)
-        result = session.run("""
-            MATCH (e:Entity)
-            RETURN e.name AS name, e.summary AS summary
-            LIMIT 10
+        # Fetch sample entities and sample relationships in a single round-trip
+        result = await session.run("""
+            CALL {
+                MATCH (e:Entity)
+                WITH e LIMIT 10
+                RETURN collect({name: e.name, summary: e.summary}) AS entities
+            }
+            CALL {
+                MATCH (a:Entity)-[r:RELATES_TO]->(b:Entity)
+                WITH a, r, b LIMIT 10
+                RETURN collect({from: a.name, to: b.name, fact: r.fact}) AS relationships
+            }
+            RETURN entities, relationships
         """)
+        samples = await result.single()
         
-        for i, record in enumerate(result, 1):
-            name = record.get("name", "N/A")
-            summary = record.get("summary", "No summary")
+        for i, entity in enumerate(samples["entities"], 1):
+            name = entity["name"] or "N/A"
+            summary = entity["summary"] or "No summary"
             print(f"\n{i}. {name}")
             print(f"   Summary: {summary[:150]}...")
         
@@ -58,37 +67,36 @@ def check_database():
         print("\n" + "=" * 80)
         print("DRUGS WITH PAIN/INFLAMMATION PROPERTIES")
         print("=" * 80)
-        result = session.run("""
-            MATCH (e:Entity)
-            WHERE e.summary CONTAINS 'pain' OR e.summary CONTAINS 'inflammation'
-               OR e.summary CONTAINS 'NSAID' OR e.summary CONTAINS 'analgesic'
-            RETURN e.name AS name, e.summary AS summary
+        # Uses the full-text index Graphiti creates in build_indices_and_constraints();
+        # prefix terms keep the substring matches CONTAINS gave ("NSAIDs", "anti-inflammatory")
+        result = await session.run("""
+            CALL db.index.fulltext.queryNodes(
+                'node_name_and_summary',
+                'summary:(pain* OR inflammat* OR nsaid* OR analgesic*)'
+            ) YIELD node, score
+            RETURN node.name AS name, node.summary AS summary, score
             LIMIT 20
         """)
         
-        records = list(result)
-        print(f"\nFound {len(records)} drugs with pain/inflammation properties:")
-        for record in records:
+        print()
+        found = 0
+        async for record in result:
+            found += 1
             print(f"  - {record['name']}")
+        print(f"Found {found} drugs with pain/inflammation properties")
         
         # Sample relationships
         print("\n" + "=" * 80)
         print("SAMPLE RELATIONSHIPS")
         print("=" * 80)
-        result = session.run("""
-            MATCH (a:Entity)-[r:RELATES_TO]->(b:Entity)
-            RETURN a.name AS from, b.name AS to, r.fact AS fact
-            LIMIT 10
-        """)
-        
-        for i, record in enumerate(result, 1):
-            print(f"\n{i}. {record['from']} → {record['to']}")
-            print(f"   Fact: {record.get('fact', 'No fact')[:200]}")
+        for i, rel in enumerate(samples["relationships"], 1):
+            print(f"\n{i}. {rel['from']} → {rel['to']}")
+            print(f"   Fact: {(rel['fact'] or 'No fact')[:200]}")
     
-    driver.close()
+    await close_async_driver()
     print("\n" + "=" * 80)
     print("✅ DATABASE CHECK COMPLETE")
     print("=" * 80)
 
 if __name__ == "__main__":
-    check_database()
+    asyncio.run(check_database())
@@ -1,5 +1,7 @@
-import requests
-import json
+import asyncio
+import httpx
+import io
+import orjson
 import time
 import sys
 
@@ -7,6 +9,9 @@ import sys
 API_URL = "http://localhost:8000/ask"
 HEADERS = {"Content-Type": "application/json"}
 
+# Crew runs can take minutes when the LLM is rate-limited
+REQUEST_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
 class Colors:
     HEADER = '\033[95m'
     BLUE = '\033[94m'
@@ -18,27 +23,37 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
-def print_separator(title):
-    print(f"\n{Colors.HEADER}{'='*60}")
-    print(f" {title}")
-    print(f"{'='*60}{Colors.ENDC}")
+def print_separator(title, file=None):
+    print(f"\n{Colors.HEADER}{'='*60}", file=file)
+    print(f" {title}", file=file)
+    print(f"{'='*60}{Colors.ENDC}", file=file)
+
+async def run_test(client, scenario_num, title, query, session_id=None, description=""):
+    # Buffer the scenario report and write it in one go, so concurrent
+    # scenarios don't interleave their output
+    out = io.StringIO()
+    try:
+        return await _run_test(client, out, scenario_num, title, query, session_id, description)
+    finally:
+        sys.stdout.write(out.getvalue())
+        sys.stdout.flush()
 
-def run_test(scenario_num, title, query, session_id=None, description=""):
-    print_separator(f"SCENARIO {scenario_num}: {title}")
-    print(f"{Colors.CYAN}Description:{Colors.ENDC} {description}")
-    print(f"{Colors.BLUE}Query:{Colors.ENDC} {query}")
+async def _run_test(client, out, scenario_num, title, query, session_id, description):
+    print_separator(f"SCENARIO {scenario_num}: {title}", file=out)
+    print(f"{Colors.CYAN}Description:{Colors.ENDC} {description}", file=out)
+    print(f"{Colors.BLUE}Query:{Colors.ENDC} {query}", file=out)
     
     payload = {
         "query": query,
         "session_id": session_id
     }
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
-        response = requests.post(API_URL, headers=HEADERS, json=payload)
+        response = await client.post(API_URL, headers=HEADERS, json=payload)
         response.raise_for_status()
-        data = response.json()
-        duration = time.time() - start_time
+        data = orjson.loads(response.content)
+        duration = time.perf_counter() - start_time
         
         # Extract key metrics
         new_session_id = data.get("session_id")
@@ -47,39 +62,44 @@ def run_test(scenario_num, title, query, session_id=None, description=""):
         intent = analysis.get("intent", "N/A")
         complexity = analysis.get("complexity", "N/A")
         
-        print(f"\n{Colors.GREEN}✅ SUCCESS ({duration:.2f}s){Colors.ENDC}")
-        print(f"{Colors.BOLD}Processing Mode:{Colors.ENDC} {processing_mode}")
-        print(f"{Colors.BOLD}Detected Intent:{Colors.ENDC} {intent}")
-        print(f"{Colors.BOLD}Complexity Score:{Colors.ENDC} {complexity}/5")
+        print(f"\n{Colors.GREEN}✅ SUCCESS ({duration:.2f}s){Colors.ENDC}", file=out)
+        print(f"{Colors.BOLD}Processing Mode:{Colors.ENDC} {processing_mode}", file=out)
+        print(f"{Colors.BOLD}Detected Intent:{Colors.ENDC} {intent}", file=out)
+        print(f"{Colors.BOLD}Complexity Score:{Colors.ENDC} {complexity}/5", file=out)
         
-        print(f"\n{Colors.BOLD}🤖 Agent Response:{Colors.ENDC}")
-        print("-" * 40)
-        print(data.get("response", "No response text").strip())
-        print("-" * 40)
+        print(f"\n{Colors.BOLD}🤖 Agent Response:{Colors.ENDC}", file=out)
+        print("-" * 40, file=out)
+        print(data.get("response", "No response text").strip(), file=out)
+        print("-" * 40, file=out)
         
         return new_session_id
         
-    except requests.exceptions.ConnectionError:
-        print(f"\n{Colors.FAIL}❌ ERROR: Could not connect to server at {API_URL}{Colors.ENDC}")
-        print("Make sure the server is running: `python start_app.py`")
+    except httpx.ConnectError:
+        print(f"\n{Colors.FAIL}❌ ERROR: Could not connect to server at {API_URL}{Colors.ENDC}", file=out)
+        print("Make sure the server is running: `python start_app.py`", file=out)
         sys.exit(1)
     except Exception as e:
-        print(f"\n{Colors.FAIL}❌ ERROR: {e}{Colors.ENDC}")
+        print(f"\n{Colors.FAIL}❌ ERROR: {e}{Colors.ENDC}", file=out)
         return session_id
 
-def main():
+async def main():
     print(f"{Colors.BOLD}🏥 MEDICAL AGENT SYSTEM EVALUATION{Colors.ENDC}")
     print("Running 5 strategic test scenarios to demonstrate system capabilities.\n")
     
-    # Wait for server check
-    try:
-        requests.get("http://localhost:8000/")
-    except:
-        print(f"{Colors.FAIL}Server is not running! Please run 'python start_app.py' in another terminal.{Colors.ENDC}")
-        return
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+        # Wait for server check
+        try:
+            await client.get("http://localhost:8000/")
+        except httpx.HTTPError:
+            print(f"{Colors.FAIL}Server is not running! Please run 'python start_app.py' in another terminal.{Colors.ENDC}")
+            return
+
+        await run_scenarios(client)
 
+async def run_scenarios(client):
     # --- SCENARIO 1: Basic Retrieval ---
-    session_id = run_test(
+    session_id = await run_test(
+        client,
         1, 
         "Knowledge Graph Retrieval", 
         "What is Warfarin used for?", 
@@ -87,26 +107,32 @@ def main():
         "Demonstrates basic entity retrieval from the Neo4j Knowledge Graph."
     )
     
-    # --- SCENARIO 2: Safety & Interactions ---
-    run_test(
-        2, 
-        "Safety Validation (Multi-Agent)", 
-        "I am taking Warfarin. Is it safe to take Aspirin with it?", 
-        session_id,
-        "Demonstrates the Safety Validator agent detecting dangerous drug interactions (Major Severity)."
-    )
-    
-    # --- SCENARIO 3: Complex Logic (Cypher) ---
-    run_test(
-        3, 
-        "Complex Graph Query (Cypher)", 
-        "Find all contraindications for Aspirin.", 
-        session_id,
-        "Tests the dynamic Cypher query generation to find specific relationships in the graph."
+    # --- SCENARIOS 2 & 3: independent of each other, run concurrently ---
+    await asyncio.gather(
+        # --- SCENARIO 2: Safety & Interactions ---
+        run_test(
+            client,
+            2, 
+            "Safety Validation (Multi-Agent)", 
+            "I am taking Warfarin. Is it safe to take Aspirin with it?", 
+            session_id,
+            "Demonstrates the Safety Validator agent detecting dangerous drug interactions (Major Severity)."
+        ),
+        
+        # --- SCENARIO 3: Complex Logic (Cypher) ---
+        run_test(
+            client,
+            3, 
+            "Complex Graph Query (Cypher)", 
+            "Find all contraindications for Aspirin.", 
+            session_id,
+            "Tests the dynamic Cypher query generation to find specific relationships in the graph."
+        )
     )
 
     # --- SCENARIO 4: Contextual Memory ---
-    run_test(
+    await run_test(
+        client,
         4, 
         "Contextual Memory Retention", 
         "What are the side effects?", 
@@ -115,7 +141,8 @@ def main():
     )
 
     # --- SCENARIO 5: Chain of Thought / Comparison ---
-    run_test(
+    await run_test(
+        client,
         5, 
         "Complex Reasoning & Comparison", 
         "Compare the bleeding risks of Warfarin versus Aspirin. Which requires more monitoring?", 
@@ -127,4 +154,4 @@ def main():
     print(f"{Colors.GREEN}System demonstrated capabilities in: Graph RAG, Multi-Agent Safety Checks, Cypher Generation, Memory, and Reasoning.{Colors.ENDC}")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
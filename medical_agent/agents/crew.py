@@ -29,8 +29,12 @@ else:
     print("🖥️  Using Local Ollama LLM (llama3:8b)")
 
 # --- Agents ---
+# Each crew gets its own agents: CrewAI binds crew, executor (message history)
+# and delegation tools onto the agent at kickoff, so sharing one instance
+# across concurrent crews would mix users' conversations. Building an agent
+# is cheap next to the LLM calls it makes.
 
-def get_clinical_researcher():
+def get_clinical_researcher(max_iter: int = 3):
     """Research agent - gathers information from graph and web."""
     return Agent(
         role='Clinical Researcher',
@@ -48,10 +52,10 @@ def get_clinical_researcher():
         allow_delegation=True,  # Can delegate to safety validator
         tools=[graph_db_tool, cypher_query_tool, web_search_tool],
         llm=llm,
-        max_iter=3  
+        max_iter=max_iter
     )
 
-def get_safety_validator():
+def get_safety_validator(max_iter: int = 2):
     """Safety agent - validates drug safety and interactions."""
     return Agent(
         role='Safety Validator',
@@ -70,10 +74,10 @@ def get_safety_validator():
         allow_delegation=False,
         tools=[cypher_query_tool, graph_db_tool],
         llm=llm,
-        max_iter=2  # Reduced from 3 - safety checks should be quick
+        max_iter=max_iter  # 2 by default - safety checks should be quick
     )
 
-def get_medical_analyst():
+def get_medical_analyst(max_iter: int = 2):
     """Synthesis agent - creates final medical recommendations."""
     return Agent(
         role='Medical Analyst',
@@ -90,7 +94,7 @@ def get_medical_analyst():
         allow_delegation=False,
         tools=[],  # Synthesis agent doesn't need tools
         llm=llm,
-        max_iter=2
+        max_iter=max_iter
     )
 
 # --- Crews ---
@@ -120,18 +124,18 @@ def create_medical_crew(query: str, analysis: 'QueryAnalysis' = None, apply_cot:
         router = get_router()
         analysis = router.analyze_query(query)
     
-    # Get agents based on analysis
-    researcher = get_clinical_researcher()
-    
-    # Override max_iter based on intelligent analysis
-    researcher.max_iter = analysis.max_iterations.get('researcher', 3)
+    # Get agents based on analysis (iteration limits from the intelligent analysis)
+    researcher = get_clinical_researcher(analysis.max_iterations.get('researcher', 3))
     
     # Build tool priority list from analysis
-    tool_priority = ', '.join([
+    priority_list = [
         'Graph Database Search' if t == 'graph_db' else
         'Cypher Query Executor' if t == 'cypher' else
         'Web Search' for t in analysis.suggested_tools
-    ])
+    ]
+    tool_priority = ', '.join(priority_list)
+    first_tool = priority_list[0] if priority_list else 'Graph Database Search'
+    second_tool = priority_list[1] if len(priority_list) > 1 else 'Web Search'
     
     # Prepare Chain of Thought instructions if applicable
     cot_instructions = ""
@@ -151,6 +155,14 @@ For each step, explicitly state:
 Then synthesize all steps into a final answer.
 """
     
+    # The validator looks up interactions from the query itself, so when an
+    # analyst synthesizes both reports the two gathering tasks can overlap.
+    # CrewAI requires a sync task (the analyst) to join async ones.
+    parallel_gathering = (
+        'validator' in analysis.required_agents and
+        'analyst' in analysis.required_agents
+    )
+    
     # Task 1: Research (always executed, but optimized)
     research_task = Task(
         description=f"""Research the question: '{query}'
@@ -167,8 +179,8 @@ Then synthesize all steps into a final answer.
         5. Maximum {analysis.max_iterations['researcher']} iterations total
         
         EXECUTION STRATEGY:
-        - Iteration 1: Try {tool_priority.split(', ')[0]}
-        - If incomplete: Iteration 2: Try {tool_priority.split(', ')[1] if len(tool_priority.split(', ')) > 1 else 'Web Search'}
+        - Iteration 1: Try {first_tool}
+        - If incomplete: Iteration 2: Try {second_tool}
         - If still incomplete: Iteration 3: Try remaining tools or refine query
         
         OPTIMIZATION: This query has complexity {analysis.complexity}/5. 
@@ -177,7 +189,8 @@ Then synthesize all steps into a final answer.
         Return findings with sources cited.
         """,
         agent=researcher,
-        expected_output="Research findings with data sources."
+        expected_output="Research findings with data sources.",
+        async_execution=parallel_gathering
     )
     
     tasks = [research_task]
@@ -185,8 +198,7 @@ Then synthesize all steps into a final answer.
     
     # Conditionally add agents based on LLM analysis (not hardcoded keywords)
     if 'validator' in analysis.required_agents:
-        validator = get_safety_validator()
-        validator.max_iter = analysis.max_iterations.get('validator', 2)
+        validator = get_safety_validator(analysis.max_iterations.get('validator', 2))
         agents.append(validator)
         
         safety_task = Task(
@@ -204,14 +216,14 @@ Then synthesize all steps into a final answer.
             """,
             agent=validator,
             expected_output="Safety validation report with risk levels.",
-            context=[research_task]
+            context=[] if parallel_gathering else [research_task],
+            async_execution=parallel_gathering
         )
         tasks.append(safety_task)
     
     # Add analyst for complex queries (LLM decides, not keywords)
     if 'analyst' in analysis.required_agents:
-        analyst = get_medical_analyst()
-        analyst.max_iter = analysis.max_iterations.get('analyst', 1)
+        analyst = get_medical_analyst(analysis.max_iterations.get('analyst', 1))
         agents.append(analyst)
         
         synthesis_task = Task(
@@ -234,7 +246,7 @@ Then synthesize all steps into a final answer.
     
     print(f"\n🎯 Crew Configuration (AI-optimized):")
     print(f"   Agents: {len(agents)} ({', '.join([a.role for a in agents])})")
-    print(f"   Tasks: {len(tasks)}")
+    print(f"   Tasks: {len(tasks)}{' (research + safety in parallel)' if parallel_gathering else ''}")
     print(f"   Max iterations: {analysis.max_iterations}")
     if apply_cot and analysis.use_chain_of_thought:
         print(f"   🧠 Chain of Thought: ENABLED ({len(analysis.cot_reasoning_steps)} steps)")
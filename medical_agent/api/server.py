@@ -1,22 +1,60 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Header
-from fastapi.responses import StreamingResponse, HTMLResponse
+from fastapi.responses import StreamingResponse, HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from medical_agent.agents.crew import create_medical_crew
-from medical_agent.graph.client import get_graphiti_client
+from medical_agent.graph.client import get_shared_graphiti_client, close_shared_graphiti_client
 from medical_agent.utils.intelligent_router import get_router
 from medical_agent.utils.memory_manager import MemoryManager
 from medical_agent.utils.mcp_processor import get_mcp_processor
 from medical_agent.utils.chain_of_thought import get_cot_processor
+from medical_agent.utils.semantic_cache import get_semantic_cache, key_terms
+from medical_agent.config import Config
+from cachetools import TTLCache
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
-import json
+import logging
 from pathlib import Path
 import hashlib
 import re
 from typing import Optional
 
-app = FastAPI(title="Medical Agent API")
+logger = logging.getLogger(__name__)
+
+# Dedicated pool for crew runs: bounds concurrent crews (LLM quota, Neo4j load)
+# and keeps them from starving the default to_thread executor
+_CREW_POOL = ThreadPoolExecutor(max_workers=Config.CREW_CONCURRENCY, thread_name_prefix="crew")
+
+# Shared processors, resolved once at startup (see lifespan)
+ROUTER = None
+MCP = None
+COT = None
+SEMANTIC_CACHE = None
+
+async def _expire_sessions_periodically(interval: float = 300.0):
+    """Sweep idle sessions so their memory is freed even when no new session arrives."""
+    while True:
+        await asyncio.sleep(interval)
+        MemoryManager.expire_sessions()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up shared processors before serving requests; release shared clients on shutdown."""
+    global ROUTER, MCP, COT, SEMANTIC_CACHE
+    print("🔥 Warming up router, processors and embedding model...")
+    ROUTER, MCP, COT, SEMANTIC_CACHE = await asyncio.to_thread(
+        lambda: (get_router(), get_mcp_processor(), get_cot_processor(), get_semantic_cache())
+    )
+    session_sweeper = asyncio.create_task(_expire_sessions_periodically())
+    yield
+    session_sweeper.cancel()
+    _CREW_POOL.shutdown(wait=False, cancel_futures=True)
+    await close_shared_graphiti_client()
+
+# orjson serializes the large markdown responses much faster than stdlib json
+app = FastAPI(title="Medical Agent API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -28,9 +66,31 @@ app.add_middleware(
 )
 
 # ====== OPTIMIZATION: Response Cache ======
-# Cache complete crew results to avoid re-running identical queries
-RESPONSE_CACHE = {}
+# Cache complete crew results to avoid re-running identical queries.
+# Bounded (LRU eviction past RESPONSE_CACHE_SIZE) and entries expire after CACHE_TTL.
 CACHE_TTL = 3600  # 1 hour
+RESPONSE_CACHE = TTLCache(maxsize=Config.RESPONSE_CACHE_SIZE, ttl=CACHE_TTL)
+CACHE_STATS = {"hits": 0, "semantic_hits": 0, "misses": 0, "coalesced": 0}
+
+# Identical queries currently being answered (in-flight key -> pipeline task)
+INFLIGHT = {}
+
+# Dosage and interaction answers hinge on the exact drugs and doses asked
+# about: never serve them from a paraphrase match
+_NO_SEMANTIC_INTENTS = frozenset({"dosage", "interaction"})
+
+def _semantic_cacheable(analysis, context: str) -> bool:
+    """
+    Whether a query may be answered from (and stored in) the semantic cache.
+    Only answers produced without conversation context are session-independent.
+    """
+    return not context and analysis.intent not in _NO_SEMANTIC_INTENTS
+
+# Keys are only used for dict lookup, not security: prefer BLAKE3 when installed
+try:
+    from blake3 import blake3 as _cache_hash
+except ImportError:
+    _cache_hash = hashlib.sha256
 
 def get_cache_key(query: str) -> str:
     """
@@ -39,15 +99,22 @@ def get_cache_key(query: str) -> str:
     Example: 'Aspirin interaction' and 'interaction Aspirin' → same key
     """
     # Normalize: lowercase, sort words, remove extra spaces
-    words = sorted(query.lower().strip().split())
+    words = sorted(query.lower().split())
     normalized = ' '.join(words)
-    return hashlib.sha256(normalized.encode()).hexdigest()[:16]  # Short hash
+    return _cache_hash(normalized.encode()).hexdigest()[:16]  # Short hash
 
 # Mount static files for frontend
 static_dir = Path(__file__).parent.parent.parent / "static"
 static_dir.mkdir(exist_ok=True)
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
+# The chat UI is static: read it once instead of on every /chat hit
+_chat_html_path = static_dir / "chat.html"
+CHAT_RESPONSE = HTMLResponse(
+    _chat_html_path.read_text(encoding='utf-8') if _chat_html_path.exists()
+    else "<h1>Chat UI not found. Run setup to create it.</h1>"
+)
+
 class QueryRequest(BaseModel):
     query: str
     session_id: Optional[str] = None
@@ -61,10 +128,110 @@ def read_root():
 @app.get("/chat", response_class=HTMLResponse)
 async def chat_ui():
     """Serve the chat UI."""
-    html_path = Path(__file__).parent.parent.parent / "static" / "chat.html"
-    if html_path.exists():
-        return html_path.read_text(encoding='utf-8')
-    return "<h1>Chat UI not found. Run setup to create it.</h1>"
+    return CHAT_RESPONSE
+
+async def _run_cot(query: str, analysis, research_findings: str) -> dict:
+    """Chain of Thought over the research findings (steps run concurrently when COT_PARALLEL_STEPS is set)."""
+    if Config.COT_PARALLEL_STEPS:
+        return await COT.process_with_cot_async(
+            query, analysis.cot_reasoning_steps, research_findings,
+            dependencies=analysis.cot_step_dependencies
+        )
+    return await asyncio.to_thread(
+        COT.process_with_cot,
+        query=query,
+        reasoning_steps=analysis.cot_reasoning_steps,
+        research_findings=research_findings
+    )
+
+
+async def _run_pipeline(query: str, analysis, use_mcp: bool, context: str, query_embedding, cache_key: str) -> dict:
+    """
+    Answer a query with MCP or the crew (plus CoT) and cache the result.
+    Returns the response payload without session-specific fields.
+    """
+    # === PROCESSING MODE SELECTION ===
+    
+    if use_mcp:
+        # === MCP MODE: Parallel Tool Execution ===
+        print(f"🔄 Using Multi-Context Processing (parallel)")
+        
+        contexts = None  # Auto-select
+        if analysis.complexity >= 4:
+            contexts = ['graph_db', 'cypher', 'web']  # All tools for very complex
+        
+        mcp_result = await MCP.process_query(
+            query=query,
+            contexts=contexts,
+            timeout=20
+        )
+        
+        response_text = mcp_result.merged_content
+        
+        # Apply CoT if needed
+        if analysis.use_chain_of_thought and analysis.cot_reasoning_steps:
+            print(f"🧠 Applying Chain of Thought reasoning...")
+            cot_result = await _run_cot(query, analysis, response_text)
+            cot_formatted = COT.format_cot_for_display(cot_result)
+            response_text = f"{cot_formatted}\n\n---\n\n## 📋 Research Details\n\n{response_text}"
+        
+        # Cache for later (and concurrent) identical queries
+        RESPONSE_CACHE[cache_key] = response_text
+        if _semantic_cacheable(analysis, context):
+            SEMANTIC_CACHE.add(query_embedding, response_text, "mcp", key_terms(query))
+        
+        return {
+            "response": response_text,
+            "from_cache": False,
+            "processing_mode": "MCP",
+            "latency_ms": mcp_result.total_latency_ms,
+            "sources_used": mcp_result.sources_used,
+            "confidence": mcp_result.confidence_score,
+            "analysis": {
+                "intent": analysis.intent,
+                "complexity": analysis.complexity,
+                "use_cot": analysis.use_chain_of_thought
+            }
+        }
+    
+    else:
+        # === TRADITIONAL CREW MODE: Sequential Multi-Agent ===
+        print(f"🤖 Using Traditional Crew (sequential multi-agent)")
+        
+        # Prepare query with context
+        query_with_context = query
+        if context:
+            query_with_context = f"{context}\n\n## Current Query:\n{query}"
+        
+        # Run crew
+        crew = create_medical_crew(query_with_context, analysis)
+        result = await asyncio.get_running_loop().run_in_executor(_CREW_POOL, crew.kickoff)
+        response_text = result.raw if hasattr(result, 'raw') else str(result)
+        
+        # Apply CoT if needed
+        if analysis.use_chain_of_thought and analysis.cot_reasoning_steps:
+            print(f"🧠 Applying Chain of Thought reasoning...")
+            cot_result = await _run_cot(query, analysis, response_text)
+            cot_formatted = COT.format_cot_for_display(cot_result)
+            response_text = f"{cot_formatted}\n\n---\n\n## 📋 Detailed Research Findings\n\n{response_text}"
+        
+        # Cache for later (and concurrent) identical queries
+        RESPONSE_CACHE[cache_key] = response_text
+        if _semantic_cacheable(analysis, context):
+            SEMANTIC_CACHE.add(query_embedding, response_text, "crew", key_terms(query))
+        
+        return {
+            "response": response_text,
+            "from_cache": False,
+            "processing_mode": "CREW",
+            "analysis": {
+                "intent": analysis.intent,
+                "complexity": analysis.complexity,
+                "use_cot": analysis.use_chain_of_thought,
+                "agents_used": analysis.required_agents
+            }
+        }
+
 
 @app.post("/ask")
 async def ask_agent(request: QueryRequest):
@@ -89,24 +256,39 @@ async def ask_agent(request: QueryRequest):
         # Get or create memory session
         memory = MemoryManager.get_session(request.session_id)
         
-        # Use intelligent LLM-powered routing
-        router = get_router()
-        analysis = router.analyze_query(request.query)
+        # Obvious off-topic queries are rejected without an LLM round-trip
+        analysis = ROUTER.prefilter(request.query)
+        if analysis is not None:
+            context, query_embedding = "", None
+        else:
+            # Routing (LLM), conversation context and the query embedding are
+            # independent, so run them concurrently (and off the event loop)
+            analysis, context, query_embedding = await asyncio.gather(
+                asyncio.to_thread(ROUTER.analyze_query, request.query),
+                asyncio.to_thread(memory.get_context_for_query, request.query),
+                asyncio.to_thread(SEMANTIC_CACHE.embed, request.query)
+            )
         
-        print(f"🧠 Query Analysis:")
-        print(f"   Intent: {analysis.intent}")
-        print(f"   Complexity: {analysis.complexity}/5")
-        print(f"   Agents: {', '.join(analysis.required_agents)}")
-        print(f"   Use CoT: {analysis.use_chain_of_thought}")
-        print(f"   Session: {memory.session_id}")
+        # One structured record (formatted lazily, only if INFO is enabled)
+        logger.info(
+            "🧠 Query analysis: intent=%s complexity=%s/5 agents=%s cot=%s session=%s",
+            analysis.intent, analysis.complexity, analysis.required_agents,
+            analysis.use_chain_of_thought, memory.session_id,
+            extra={
+                "intent": analysis.intent,
+                "complexity": analysis.complexity,
+                "agents": analysis.required_agents,
+                "use_cot": analysis.use_chain_of_thought,
+                "session_id": memory.session_id
+            }
+        )
         
         # Reject non-medical queries
         if not analysis.is_medical:
             print(f"⚠️  Non-medical query rejected (confidence: {analysis.confidence:.2f})")
             rejection_msg = analysis.rejection_message or \
                     "I'm a medical AI assistant. Please ask about medications, drug interactions, or medical conditions."
-            memory.add_user_message(request.query)
-            memory.add_ai_message(rejection_msg)
+            memory.add_exchange(request.query, rejection_msg)
             return {
                 "response": rejection_msg,
                 "session_id": memory.session_id,
@@ -124,18 +306,15 @@ async def ask_agent(request: QueryRequest):
                 'interaction' in analysis.intent
             )
         
-        # Get conversation context
-        context = memory.get_context_for_query(request.query)
-        
         # Check cache
         cache_mode = "mcp" if use_mcp else "crew"
         cache_key = get_cache_key(f"{cache_mode}:{memory.session_id}:{request.query}")
         
-        if cache_key in RESPONSE_CACHE:
+        cached_response = RESPONSE_CACHE.get(cache_key)
+        if cached_response is not None:
+            CACHE_STATS["hits"] += 1
             print(f"📦 Cache hit ({cache_mode} mode)")
-            cached_response = RESPONSE_CACHE[cache_key]
-            memory.add_user_message(request.query)
-            memory.add_ai_message(cached_response)
+            memory.add_exchange(request.query, cached_response)
             return {
                 "response": cached_response,
                 "session_id": memory.session_id,
@@ -147,104 +326,55 @@ async def ask_agent(request: QueryRequest):
                 }
             }
         
-        # Add to memory
-        memory.add_user_message(request.query)
-        
-        # === PROCESSING MODE SELECTION ===
-        
-        if use_mcp:
-            # === MCP MODE: Parallel Tool Execution ===
-            print(f"🔄 Using Multi-Context Processing (parallel)")
-            
-            mcp = get_mcp_processor()
-            contexts = None  # Auto-select
-            if analysis.complexity >= 4:
-                contexts = ['graph_db', 'cypher', 'web']  # All tools for very complex
-            
-            mcp_result = await mcp.process_query(
-                query=request.query,
-                contexts=contexts,
-                timeout=20
-            )
-            
-            response_text = mcp_result.merged_content
-            
-            # Apply CoT if needed
-            if analysis.use_chain_of_thought and analysis.cot_reasoning_steps:
-                print(f"🧠 Applying Chain of Thought reasoning...")
-                cot_processor = get_cot_processor()
-                cot_result = cot_processor.process_with_cot(
-                    query=request.query,
-                    reasoning_steps=analysis.cot_reasoning_steps,
-                    research_findings=response_text
-                )
-                cot_formatted = cot_processor.format_cot_for_display(cot_result)
-                response_text = f"{cot_formatted}\n\n---\n\n## 📋 Research Details\n\n{response_text}"
-            
-            # Add to memory and cache
-            memory.add_ai_message(response_text)
-            RESPONSE_CACHE[cache_key] = response_text
-            
-            return {
-                "response": response_text,
-                "session_id": memory.session_id,
-                "from_cache": False,
-                "processing_mode": "MCP",
-                "latency_ms": mcp_result.total_latency_ms,
-                "sources_used": mcp_result.sources_used,
-                "confidence": mcp_result.confidence_score,
-                "analysis": {
-                    "intent": analysis.intent,
-                    "complexity": analysis.complexity,
-                    "use_cot": analysis.use_chain_of_thought
+        # Semantic cache: catch paraphrases of earlier questions (same limits
+        # as the insert in _run_pipeline, see _semantic_cacheable)
+        if _semantic_cacheable(analysis, context):
+            match = SEMANTIC_CACHE.search(query_embedding, key_terms(request.query))
+            if match is not None:
+                entry, similarity = match
+                CACHE_STATS["semantic_hits"] += 1
+                print(f"📦 Semantic cache hit (similarity: {similarity:.3f})")
+                memory.add_exchange(request.query, entry.response)
+                RESPONSE_CACHE[cache_key] = entry.response
+                return {
+                    "response": entry.response,
+                    "session_id": memory.session_id,
+                    "from_cache": True,
+                    "processing_mode": entry.mode.upper(),
+                    "similarity": similarity,
+                    "analysis": {
+                        "intent": analysis.intent,
+                        "complexity": analysis.complexity
+                    }
                 }
-            }
         
+        CACHE_STATS["misses"] += 1
+        
+        # Coalesce identical in-flight queries: later callers await the first
+        # caller's task instead of starting another MCP/crew run. Context-free
+        # answers don't depend on the session, so those coalesce across users.
+        # The task is shielded so a disconnecting client doesn't cancel it for the others.
+        inflight_key = cache_key if context else get_cache_key(f"{cache_mode}:{request.query}")
+        task = INFLIGHT.get(inflight_key)
+        if task is None:
+            task = asyncio.ensure_future(_run_pipeline(
+                request.query, analysis, use_mcp, context, query_embedding, cache_key
+            ))
+            INFLIGHT[inflight_key] = task
+            task.add_done_callback(lambda _: INFLIGHT.pop(inflight_key, None))
         else:
-            # === TRADITIONAL CREW MODE: Sequential Multi-Agent ===
-            print(f"🤖 Using Traditional Crew (sequential multi-agent)")
-            
-            # Prepare query with context
-            query_with_context = request.query
-            if context:
-                query_with_context = f"{context}\n\n## Current Query:\n{request.query}"
-            
-            # Run crew
-            crew = create_medical_crew(query_with_context, analysis)
-            result = crew.kickoff()
-            response_text = result.raw if hasattr(result, 'raw') else str(result)
-            
-            # Apply CoT if needed
-            if analysis.use_chain_of_thought and analysis.cot_reasoning_steps:
-                print(f"🧠 Applying Chain of Thought reasoning...")
-                cot_processor = get_cot_processor()
-                cot_result = cot_processor.process_with_cot(
-                    query=request.query,
-                    reasoning_steps=analysis.cot_reasoning_steps,
-                    research_findings=response_text
-                )
-                cot_formatted = cot_processor.format_cot_for_display(cot_result)
-                response_text = f"{cot_formatted}\n\n---\n\n## 📋 Detailed Research Findings\n\n{response_text}"
-            
-            # Add to memory and cache
-            memory.add_ai_message(response_text)
-            RESPONSE_CACHE[cache_key] = response_text
-            
-            stats = memory.get_memory_stats()
-            
-            return {
-                "response": response_text,
-                "session_id": memory.session_id,
-                "from_cache": False,
-                "processing_mode": "CREW",
-                "memory_stats": stats,
-                "analysis": {
-                    "intent": analysis.intent,
-                    "complexity": analysis.complexity,
-                    "use_cot": analysis.use_chain_of_thought,
-                    "agents_used": analysis.required_agents
-                }
-            }
+            CACHE_STATS["coalesced"] += 1
+            print(f"🔗 Joining identical in-flight query")
+        payload = await asyncio.shield(task)
+        RESPONSE_CACHE[cache_key] = payload["response"]  # joiners' sessions too
+        
+        # Add to memory
+        memory.add_exchange(request.query, payload["response"])
+        
+        response = {**payload, "session_id": memory.session_id}
+        if not use_mcp:
+            response["memory_stats"] = memory.get_memory_stats()
+        return response
             
     except Exception as e:
         import traceback
@@ -253,14 +383,9 @@ async def ask_agent(request: QueryRequest):
 
 @app.get("/graph-info")
 async def graph_info():
-    client = await get_graphiti_client()
     try:
-        # Try to get stats using a simpler method or fallback
-        # If client.driver is a Neo4j Driver object, we can try to use it directly.
-        # However, if 'AsyncSession' error occurs, it might be due to how we access it.
-        
-        # Let's try a simple connectivity check first
-        # await client.driver.verify_connectivity() # This method might not exist on the wrapper
+        # Reuse the process-wide client (closed on shutdown, see lifespan)
+        client = await get_shared_graphiti_client()
         
         # Try to execute a simple query if execute_query is available (Neo4j 5.x driver)
         if hasattr(client.driver, 'execute_query'):
@@ -272,8 +397,24 @@ async def graph_info():
         }
     except Exception as e:
         return {"status": "error", "detail": str(e)}
-    finally:
-        await client.close()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Response cache size and hit/miss counters."""
+    hits = CACHE_STATS["hits"] + CACHE_STATS["semantic_hits"]
+    lookups = hits + CACHE_STATS["misses"]
+    return {
+        "size": len(RESPONSE_CACHE),
+        "max_size": RESPONSE_CACHE.maxsize,
+        "ttl_seconds": CACHE_TTL,
+        "semantic_size": len(SEMANTIC_CACHE),
+        "hits": CACHE_STATS["hits"],
+        "semantic_hits": CACHE_STATS["semantic_hits"],
+        "misses": CACHE_STATS["misses"],
+        "coalesced": CACHE_STATS["coalesced"],
+        "hit_rate": hits / lookups if lookups else 0.0
+    }
 
 
 # ====== Memory Management Endpoints ======
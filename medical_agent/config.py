@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,6 +9,7 @@ class Config:
     NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
     NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+    NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "32"))  # Bolt connections per driver
 
     # API Keys
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -16,4 +18,29 @@ class Config:
 
     # Model Configuration
     GROQ_MODEL_NAME = "llama-3.3-70b-versatile"  # Using current Groq model
+    GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))  # Requests/minute budget shared by all Groq calls (30 = free tier)
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Local sentence-transformers model (no API key needed)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "onnx" = ONNX Runtime (needs optimum[onnxruntime])
+    EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")  # int8-quantized export on the Hub
+    EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "fp32")  # fp32 | bf16 (AVX512-BF16 CPUs, CUDA) | fp16 (CUDA); PyTorch backend only
+    EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "1") == "1"  # Dummy encode at load so first request is warm
+    EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or (os.cpu_count() or 2)  # CPU threads for embedding (0 = all cores)
+
+    # Session Memory (optional Redis backend; in-process when unset)
+    REDIS_URL = os.getenv("REDIS_URL")
+    SESSION_TTL = int(os.getenv("SESSION_TTL", "86400"))  # Seconds an idle session survives (Redis and in-memory)
+    MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))  # Upper bound on sessions held in-process
+
+    # Caching
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))  # Max cached /ask responses
+    SEMANTIC_CACHE_INT8 = os.getenv("SEMANTIC_CACHE_INT8", "0") == "1"  # 8-bit quantized semantic cache vectors
+    TOOL_CACHE_DIR = os.getenv("TOOL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "med_tool_cache"))  # Persistent tool results
+    TOOL_CACHE_SIZE_LIMIT = int(os.getenv("TOOL_CACHE_SIZE_LIMIT", "500000000"))  # Bytes on disk before culling
+    ROUTER_CACHE_DIR = os.getenv("ROUTER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "med_router_cache"))  # Persistent routing analyses
+    TOOL_SEMANTIC_CACHE = os.getenv("TOOL_SEMANTIC_CACHE", "0") == "1"  # Reuse tool results for paraphrased queries
+
+    # Concurrency
+    CREW_CONCURRENCY = int(os.getenv("CREW_CONCURRENCY", "8"))  # Max crews running at once
+    INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))  # Episode batches sent to Graphiti at once
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "20"))  # Chunks per add_episode_bulk call
+    COT_PARALLEL_STEPS = os.getenv("COT_PARALLEL_STEPS", "0") == "1"  # One concurrent LLM call per CoT step + synthesis
@@ -1,6 +1,8 @@
 import os
 import sys
+import asyncio
 import logging
+import threading
 from medical_agent.config import Config
 from graphiti_core import Graphiti
 from medical_agent.graph.groq_client import GroqClient
@@ -12,11 +14,23 @@ logger = logging.getLogger(__name__)
 
 _CACHED_EMBEDDER = None
 
+def get_embedder() -> LocalEmbedder:
+    """
+    Returns the shared LocalEmbedder.
+    Cached to avoid reloading the model on every call (which causes hangs/slowness).
+    """
+    global _CACHED_EMBEDDER
+    if _CACHED_EMBEDDER is None:
+        logger.info("Loading LocalEmbedder model (this happens once)...")
+        _CACHED_EMBEDDER = LocalEmbedder(
+            model_name="all-MiniLM-L6-v2"  # Fast, lightweight, runs locally
+        )
+    return _CACHED_EMBEDDER
+
 async def get_graphiti_client() -> Graphiti:
     """
     Initializes and returns the Graphiti client.
     """
-    global _CACHED_EMBEDDER
     try:
         # Load from Config
         neo4j_uri = Config.NEO4J_URI
@@ -36,14 +50,7 @@ async def get_graphiti_client() -> Graphiti:
         )
 
         # Use Local Open-Source Embeddings (no API key needed)
-        # Cache the embedder to avoid reloading the model on every call (which causes hangs/slowness)
-        if _CACHED_EMBEDDER is None:
-            logger.info("Loading LocalEmbedder model (this happens once)...")
-            _CACHED_EMBEDDER = LocalEmbedder(
-                model_name="all-MiniLM-L6-v2"  # Fast, lightweight, runs locally
-            )
-        
-        embedder = _CACHED_EMBEDDER
+        embedder = get_embedder()
 
         # Initialize Graphiti without cross_encoder (optional component)
         graphiti = Graphiti(
@@ -59,3 +66,35 @@ async def get_graphiti_client() -> Graphiti:
     except Exception as e:
         logger.error(f"Error setting up Graphiti: {e}")
         raise
+
+
+# Long-lived Graphiti clients, one per event loop (the async Neo4j driver's
+# connections are bound to the loop that opened them)
+_SHARED_CLIENTS = {}
+_SHARED_LOCK = threading.Lock()
+
+async def get_shared_graphiti_client() -> Graphiti:
+    """
+    Returns the Graphiti client shared by everything running on the current
+    event loop. Unlike get_graphiti_client(), callers must not close it;
+    use close_shared_graphiti_client() on shutdown.
+    """
+    loop = asyncio.get_running_loop()
+    client = _SHARED_CLIENTS.get(loop)
+    if client is not None:
+        return client
+
+    new_client = await get_graphiti_client()
+    with _SHARED_LOCK:
+        client = _SHARED_CLIENTS.setdefault(loop, new_client)
+    if client is not new_client:
+        # Another task on this loop won the race; drop the duplicate
+        await new_client.close()
+    return client
+
+async def close_shared_graphiti_client():
+    """Close the shared Graphiti client of the current event loop, if any."""
+    with _SHARED_LOCK:
+        client = _SHARED_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
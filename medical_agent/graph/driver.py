@@ -0,0 +1,56 @@
+import atexit
+from functools import lru_cache
+from neo4j import GraphDatabase, AsyncGraphDatabase, Driver, AsyncDriver
+from medical_agent.config import Config
+
+
+@lru_cache(maxsize=1)
+def get_driver() -> Driver:
+    """
+    Returns the process-wide Neo4j driver.
+
+    The driver owns the Bolt connection pool, so it is created once and
+    shared by every caller instead of being rebuilt per script or query.
+    """
+    return GraphDatabase.driver(
+        Config.NEO4J_URI,
+        auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD),
+        max_connection_pool_size=Config.NEO4J_POOL_SIZE,
+        connection_acquisition_timeout=30,
+        max_connection_lifetime=3600
+    )
+
+
+def close_driver():
+    """Close the shared driver (if it was created) and forget it."""
+    if get_driver.cache_info().currsize:
+        get_driver().close()
+        get_driver.cache_clear()
+
+
+# Long-lived processes (server, crew tools) never close the pool explicitly
+atexit.register(close_driver)
+
+
+@lru_cache(maxsize=1)
+def get_async_driver() -> AsyncDriver:
+    """
+    Returns the process-wide async Neo4j driver.
+
+    Use it from a single event loop; connections are bound to the loop
+    that opened them.
+    """
+    return AsyncGraphDatabase.driver(
+        Config.NEO4J_URI,
+        auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD),
+        max_connection_pool_size=Config.NEO4J_POOL_SIZE,
+        connection_acquisition_timeout=30,
+        max_connection_lifetime=3600
+    )
+
+
+async def close_async_driver():
+    """Close the shared async driver (if it was created) and forget it."""
+    if get_async_driver.cache_info().currsize:
+        await get_async_driver().close()
+        get_async_driver.cache_clear()
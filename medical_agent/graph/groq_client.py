@@ -1,10 +1,120 @@
+import asyncio
 import json
 import re
-import asyncio
+import random
+import logging
+import threading
+import time
+import orjson
 from typing import List, Dict, Any
-from groq import AsyncGroq
+from groq import AsyncGroq, RateLimitError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 from graphiti_core.prompts.models import Message
 from graphiti_core.llm_client import LLMClient, LLMConfig
+from medical_agent.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Rate-limit hint in Groq errors, e.g. "Please try again in 2.5s."
+_RETRY_RE = re.compile(r"try again in (\d+(?:\.\d+)?)s")
+
+
+_MAX_RETRIES = 15
+_MAX_WAIT = 60.0  # Cap any single wait (seconds)
+_backoff = wait_random_exponential(multiplier=2, max=_MAX_WAIT)
+
+
+def _is_rate_limit(error: BaseException) -> bool:
+    """True for Groq 429 / rate limit errors."""
+    error_str = str(error)
+    return isinstance(error, RateLimitError) or "429" in error_str or "Rate limit" in error_str
+
+
+def _rate_limit_wait(retry_state) -> float:
+    """
+    Honor the server's "try again in Ns" hint (plus jitter so concurrent
+    callers don't retry in lockstep), else use jittered exponential backoff.
+    """
+    match = _RETRY_RE.search(str(retry_state.outcome.exception()))
+    if match:
+        return min(float(match.group(1)) + random.uniform(0.5, 2.0), _MAX_WAIT)
+    return _backoff(retry_state)
+
+
+def _log_retry(retry_state):
+    print(
+        f"Rate limit hit. Retrying in {retry_state.next_action.sleep:.2f}s... "
+        f"(Attempt {retry_state.attempt_number}/{_MAX_RETRIES})"
+    )
+
+
+class RateLimiter:
+    """
+    Token bucket pacing Groq requests to a requests-per-minute budget.
+
+    Works as ``with limiter:`` in sync code and ``async with limiter:`` in
+    async code; both draw from the same bucket, so every caller in the
+    process is paced together and 429s stay the exception.
+    """
+
+    def __init__(self, requests_per_minute: int, burst: int = 5):
+        self.rate = requests_per_minute / 60.0  # tokens per second
+        self.capacity = max(1, min(burst, requests_per_minute))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token (possibly on credit) and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def __enter__(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    async def __aenter__(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+# Global Groq rate limiter (singleton)
+_groq_limiter = None
+
+def get_groq_limiter() -> RateLimiter:
+    """Get or create the process-wide Groq rate limiter."""
+    global _groq_limiter
+    if _groq_limiter is None:
+        _groq_limiter = RateLimiter(Config.GROQ_RPM)
+    return _groq_limiter
+
+
+def _strip_code_fence(text: str) -> str:
+    """Return the body of the first ```json ... ``` (or bare ```) fenced block, else the text."""
+    start = text.find("```")
+    if start == -1:
+        return text
+    body = start + 3
+    if text.startswith("json", body):
+        body += 4
+    end = text.rfind("```")
+    if end < body:
+        return text  # no closing fence
+    return text[body:end].strip()
 
 class GroqClient(LLMClient):
     def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile"):
@@ -35,75 +145,59 @@ class GroqClient(LLMClient):
         }
 
         # If a response model is expected, enforce JSON mode if supported
-        if response_model:
+        parse_json = response_model is not None
+        if parse_json:
             kwargs["response_format"] = {"type": "json_object"}
 
-        max_retries = 15
-        base_delay = 5.0
-
-        for attempt in range(max_retries):
+        try:
+            response = await self._create_completion(kwargs)
+        except Exception as e:
+            print(f"Error calling Groq API: {e}")
+            raise
+        
+        content = response.choices[0].message.content
+        
+        # If response_model is provided, we must parse the JSON content
+        if parse_json:
             try:
-                response = await self.client.chat.completions.create(**kwargs)
+                # Clean markdown code blocks if present (e.g. ```json ... ```)
+                cleaned_content = _strip_code_fence(content.strip())
                 
-                content = response.choices[0].message.content
+                try:
+                    parsed_json = orjson.loads(cleaned_content)
+                except orjson.JSONDecodeError:
+                    # Stdlib is more lenient (e.g. NaN/Infinity literals)
+                    parsed_json = json.loads(cleaned_content)
                 
-                # If response_model is provided, we must parse the JSON content
-                if response_model:
-                    try:
-                        # Clean markdown code blocks if present (e.g. ```json ... ```)
-                        cleaned_content = content.strip()
-                        # Regex to extract content between ```json and ``` or just ``` and ```
-                        json_match = re.search(r"```(?:json)?\s*(.*)\s*```", cleaned_content, re.DOTALL)
-                        if json_match:
-                            cleaned_content = json_match.group(1)
-                        
-                        parsed_json = json.loads(cleaned_content)
-                        
-                        # DEBUG: Log keys to see if edges are being returned
-                        if isinstance(parsed_json, dict):
-                            keys = list(parsed_json.keys())
-                            # print(f"DEBUG: Groq response keys: {keys}")
-                            if 'edges' in keys and not parsed_json['edges']:
-                                print("DEBUG: Warning - Model returned empty 'edges' list.")
-                        
-                        return parsed_json
-                    except Exception as e:
-                        print(f"Error parsing JSON from Groq response: {e}")
-                        print(f"Raw content: {content}")
-                        # Fallback: try to return as is, though it might fail validation
-                        pass
-
-                return {
-                    "content": content,
-                    "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens,
-                        "completion_tokens": response.usage.completion_tokens,
-                        "total_tokens": response.usage.total_tokens
-                    }
-                }
-            except Exception as e:
-                error_str = str(e)
-                # Check for rate limit error (429)
-                if "429" in error_str or "Rate limit" in error_str:
-                    wait_time = base_delay * (1.5 ** attempt) # Exponential backoff
-                    
-                    # Try to parse specific wait time from error message
-                    # Message example: "Please try again in 2.5s."
-                    try:
-                        match = re.search(r"try again in (\d+(\.\d+)?)s", error_str)
-                        if match:
-                            wait_time = float(match.group(1)) + 2.0 # Add 2s buffer
-                    except:
-                        pass
-                    
-                    # Cap wait time to avoid waiting too long (e.g. 60s)
-                    wait_time = min(wait_time, 60.0)
-
-                    if attempt < max_retries - 1:
-                        print(f"Rate limit hit. Retrying in {wait_time:.2f}s... (Attempt {attempt+1}/{max_retries})")
-                        await asyncio.sleep(wait_time)
-                        continue
+                # DEBUG: Log when edges come back empty
+                if (logger.isEnabledFor(logging.DEBUG) and isinstance(parsed_json, dict)
+                        and 'edges' in parsed_json and not parsed_json['edges']):
+                    logger.debug("Model returned empty 'edges' list.")
                 
-                print(f"Error calling Groq API: {e}")
-                if attempt == max_retries - 1:
-                    raise
\ No newline at end of file
+                return parsed_json
+            except Exception as e:
+                logger.warning("Error parsing JSON from Groq response: %s", e)
+                logger.debug("Raw content: %s", content)
+                # Fallback: try to return as is, though it might fail validation
+                pass
+
+        return {
+            "content": content,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        }
+
+    @retry(
+        stop=stop_after_attempt(_MAX_RETRIES),
+        wait=_rate_limit_wait,
+        retry=retry_if_exception(_is_rate_limit),
+        before_sleep=_log_retry,
+        reraise=True
+    )
+    async def _create_completion(self, kwargs: Dict[str, Any]):
+        """Call the Groq API, retrying rate-limit errors (other errors propagate)."""
+        async with get_groq_limiter():
+            return await self.client.chat.completions.create(**kwargs)
@@ -1,10 +1,71 @@
+import os
+import logging
+from functools import lru_cache
 from typing import Iterable
+import numpy as np
+from medical_agent.config import Config
+
+# OpenMP/MKL read this when torch is first imported, so set it beforehand
+os.environ.setdefault("OMP_NUM_THREADS", str(Config.EMBEDDING_THREADS))
+
+import torch
 from graphiti_core.embedder.client import EmbedderClient
 from sentence_transformers import SentenceTransformer
 
+logger = logging.getLogger(__name__)
+
 # Global model cache (singleton pattern for performance)
 _MODEL_CACHE = None
 
+def _load_model(model_name: str) -> SentenceTransformer:
+    """
+    Load the sentence-transformers model on the configured backend.
+    
+    With EMBEDDING_BACKEND=onnx the int8-quantized ONNX export is run by
+    ONNX Runtime (several times faster on CPU than PyTorch eager); if it
+    can't be loaded we fall back to the default PyTorch backend.
+    """
+    # Let the encoder GEMMs use every configured core
+    torch.set_num_threads(Config.EMBEDDING_THREADS)
+    try:
+        torch.set_num_interop_threads(2)
+    except RuntimeError:
+        pass  # Already set, or parallel work has already started
+    
+    if Config.EMBEDDING_BACKEND == "onnx":
+        try:
+            return SentenceTransformer(
+                model_name,
+                backend="onnx",
+                model_kwargs={"file_name": Config.EMBEDDING_ONNX_FILE}
+            )
+        except Exception as e:
+            logger.warning("ONNX embedding backend unavailable (%s), using PyTorch", e)
+    return _apply_dtype(SentenceTransformer(model_name))
+
+
+def _apply_dtype(model: SentenceTransformer) -> SentenceTransformer:
+    """
+    Cast the PyTorch model to EMBEDDING_DTYPE when the hardware supports it.
+    Half-precision weights halve memory traffic; unsupported settings keep fp32.
+    fp16 needs CUDA; on CPU the half-precision option is bf16, which it falls back to.
+    """
+    dtype = Config.EMBEDDING_DTYPE
+    if dtype == "fp16":
+        if torch.cuda.is_available():
+            return model.half()
+        dtype = "bf16"
+    if dtype == "bf16":
+        bf16_supported = getattr(torch.cpu, "_is_avx512_bf16_supported", lambda: False)
+        if torch.cuda.is_available() or bf16_supported():
+            if dtype != Config.EMBEDDING_DTYPE:
+                logger.info("EMBEDDING_DTYPE=fp16 needs CUDA, using bf16 on CPU")
+            return model.to(torch.bfloat16)
+    if Config.EMBEDDING_DTYPE != "fp32":
+        logger.warning("EMBEDDING_DTYPE=%s not supported on this hardware, keeping fp32", Config.EMBEDDING_DTYPE)
+    return model
+
+
 class LocalEmbedder(EmbedderClient):
     """
     Local embedder using sentence-transformers (runs on CPU, no API key needed).
@@ -22,8 +83,23 @@ class LocalEmbedder(EmbedderClient):
         global _MODEL_CACHE
         if _MODEL_CACHE is None:
             print(f"Loading embedding model: {model_name} (cached for reuse)...")
-            _MODEL_CACHE = SentenceTransformer(model_name)
+            _MODEL_CACHE = _load_model(model_name)
+            if Config.EMBEDDING_WARMUP:
+                # Pay one-time kernel selection / allocator setup now, not on the first query
+                _MODEL_CACHE.encode(["warmup"], convert_to_numpy=True)
         self.model = _MODEL_CACHE
+    
+    @lru_cache(maxsize=4096)
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a single string, memoized per text.
+        
+        Hot queries and duplicated chunks skip the forward pass. The returned
+        array is shared between callers and marked read-only; copy before mutating.
+        """
+        embedding = self.model.encode(text, convert_to_numpy=True)
+        embedding.setflags(write=False)
+        return embedding
         
     async def create(
         self, input_data: str | list[str] | Iterable[int] | Iterable[Iterable[int]]
@@ -37,31 +113,24 @@ class LocalEmbedder(EmbedderClient):
         Returns:
             List of floats representing the embedding vector
         """
-        print(f"DEBUG: LocalEmbedder.create called with type: {type(input_data)}")
-        if isinstance(input_data, list):
-             print(f"DEBUG: Input list length: {len(input_data)}")
-             if len(input_data) > 0:
-                 print(f"DEBUG: First item type: {type(input_data[0])}")
-                 print(f"DEBUG: First item preview: {str(input_data[0])[:50]}")
+        # Hot path: only build the introspection strings when DEBUG is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("LocalEmbedder.create called with type: %s", type(input_data))
+            if isinstance(input_data, list) and len(input_data) > 0:
+                logger.debug(
+                    "Input list length: %d, first item type: %s, preview: %s",
+                    len(input_data), type(input_data[0]), str(input_data[0])[:50]
+                )
 
         if isinstance(input_data, str):
-            # Encode the text and convert to list
-            embedding = self.model.encode(input_data, convert_to_numpy=True)
-            return embedding.tolist()
+            # Encode the text (cached) and convert to list
+            return self.embed(input_data).tolist()
         elif isinstance(input_data, list):
-            # Handle list input (e.g. list of strings)
-            # If it's a list of strings, Graphiti might be expecting a single vector 
-            # if it's calling 'create' (singular).
-            # Let's check if it's a list of strings or list of ints (already embedded?)
+            # Graphiti calls the singular 'create' with a one-element list and
+            # expects one vector back (its OpenAI embedder returns the first
+            # item's embedding), so embed that item rather than a joined string
             if len(input_data) > 0 and isinstance(input_data[0], str):
-                # If Graphiti passes a list of strings to 'create', it might expect 
-                # a single embedding for the *combined* text?
-                # Or it might be a bug in Graphiti passing a list where a string is expected.
-                # Let's try joining them, which is a common fallback.
-                print("DEBUG: Joining list of strings into single string")
-                combined_text = " ".join(input_data)
-                embedding = self.model.encode(combined_text, convert_to_numpy=True)
-                return embedding.tolist()
+                return self.embed(input_data[0]).tolist()
             
             # Fallback for other list types (e.g. existing embeddings?)
             embeddings = self.model.encode(input_data, convert_to_numpy=True)
@@ -79,5 +148,19 @@ class LocalEmbedder(EmbedderClient):
         Returns:
             List of embedding vectors
         """
-        embeddings = self.model.encode(input_data_list, convert_to_numpy=True)
-        return embeddings.tolist()
+        return self._encode_many(input_data_list).tolist()
+    
+    def _encode_many(self, texts: list[str]) -> np.ndarray:
+        """
+        Encode many texts in one batched forward pass (one row per text).
+        
+        SentenceTransformer sorts inputs by length before batching and
+        restores the original order, so each mini-batch is padded only to
+        its local max. Pass the whole list here rather than looping.
+        """
+        return self.model.encode(
+            texts,
+            batch_size=64,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
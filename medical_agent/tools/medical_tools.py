@@ -1,44 +1,239 @@
 import asyncio
+import atexit
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
 from crewai.tools import BaseTool
 from typing import Type, Dict, Any, Optional
 from pydantic import BaseModel, Field, field_validator
-from medical_agent.graph.client import get_graphiti_client
+from medical_agent.graph.client import get_embedder, get_shared_graphiti_client, close_shared_graphiti_client
 from graphiti_core.search.search_config_recipes import COMBINED_HYBRID_SEARCH_RRF
 from duckduckgo_search import DDGS
-import hashlib
-from datetime import datetime, timedelta
-from neo4j import GraphDatabase
+import diskcache
+import numpy as np
+from medical_agent.graph.driver import get_async_driver, close_async_driver
 from medical_agent.config import Config
+from medical_agent.graph.groq_client import get_groq_limiter
 from groq import Groq
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Simple in-memory cache with TTL
-_TOOL_CACHE: Dict[str, tuple[str, datetime]] = {}
-_CACHE_TTL = timedelta(hours=1)  # Cache results for 1 hour
+# Persistent event loop for async tool backends (Graphiti, async Neo4j driver),
+# running in a daemon thread. Sync CrewAI tool calls submit coroutines to it
+# instead of spinning up a new loop per call, so clients and connections are
+# reused. uvloop is used when installed.
+try:
+    import uvloop
+    _TOOL_LOOP = uvloop.new_event_loop()
+except ImportError:
+    _TOOL_LOOP = asyncio.new_event_loop()
+threading.Thread(target=_TOOL_LOOP.run_forever, name="tool-loop", daemon=True).start()
 
-def _get_cache_key(tool_name: str, query: str) -> str:
+def _run_on_tool_loop(coro):
+    """Run a coroutine on the tool loop from sync code and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _TOOL_LOOP).result()
+
+async def run_on_tool_loop_async(coro):
+    """Await a coroutine on the tool loop from another event loop (no worker thread)."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _TOOL_LOOP))
+
+async def _close_tool_loop_clients():
+    await close_shared_graphiti_client()
+    await close_async_driver()
+
+def _shutdown_tool_loop():
+    """Close the tool loop's shared Graphiti client and Neo4j driver, then stop the loop."""
+    try:
+        asyncio.run_coroutine_threadsafe(_close_tool_loop_clients(), _TOOL_LOOP).result(timeout=5)
+    except Exception as e:
+        logger.warning(f"Tool loop shutdown: {e}")
+    _TOOL_LOOP.call_soon_threadsafe(_TOOL_LOOP.stop)
+
+atexit.register(_shutdown_tool_loop)
+
+# L2: on-disk cache with TTL (survives restarts; shared by worker processes)
+_TOOL_CACHE = diskcache.Cache(Config.TOOL_CACHE_DIR, size_limit=Config.TOOL_CACHE_SIZE_LIMIT)
+_CACHE_TTL = 3600.0  # Cache results for 1 hour (seconds)
+
+# Cache keys are plain (tool, normalized query) tuples: no hashing on the hot
+# path, and diskcache stores tuple keys natively
+CacheKey = tuple[str, str]
+
+def _get_cache_key(tool_name: str, query: str) -> CacheKey:
     """Generate cache key from tool name and query."""
-    normalized = query.lower().strip()
-    return hashlib.md5(f"{tool_name}:{normalized}".encode()).hexdigest()
-
-def _check_cache(tool_name: str, query: str) -> str | None:
-    """Check if result is in cache and not expired."""
-    key = _get_cache_key(tool_name, query)
-    if key in _TOOL_CACHE:
-        result, timestamp = _TOOL_CACHE[key]
-        if datetime.now() - timestamp < _CACHE_TTL:
-            return result
+    return (tool_name, query.lower().strip())
+
+# L1: small in-process LRU in front of the disk cache, entries carry a monotonic expiry
+_MEMORY_CACHE: "OrderedDict[CacheKey, tuple[str, float]]" = OrderedDict()
+_MEMORY_CACHE_MAX = 256
+_CACHE_LOCK = threading.Lock()  # Tools run concurrently in crew threads
+
+def _remember(key: CacheKey, result: str, ttl: float):
+    """Put a result in the in-memory LRU, dropping the least recently used entry when full."""
+    with _CACHE_LOCK:
+        _MEMORY_CACHE[key] = (result, time.monotonic() + ttl)
+        _MEMORY_CACHE.move_to_end(key)
+        if len(_MEMORY_CACHE) > _MEMORY_CACHE_MAX:
+            _MEMORY_CACHE.popitem(last=False)
+
+def _check_cache(key: CacheKey) -> str | None:
+    """Check if result is in cache and not expired (key from _get_cache_key)."""
+    with _CACHE_LOCK:
+        entry = _MEMORY_CACHE.get(key)
+        if entry is not None:
+            result, expires_at = entry
+            if time.monotonic() < expires_at:
+                _MEMORY_CACHE.move_to_end(key)
+                return result
+            del _MEMORY_CACHE[key]
+    # diskcache drops expired entries itself
+    result, expire_time = _TOOL_CACHE.get(key, expire_time=True)
+    if result is not None:
+        _remember(key, result, _CACHE_TTL if expire_time is None else expire_time - time.time())
+    return result
+
+def _set_cache(key: CacheKey, result: str):
+    """Store result in cache with an expiry."""
+    _remember(key, result, _CACHE_TTL)
+    _TOOL_CACHE.set(key, result, expire=_CACHE_TTL)
+
+# Optional semantic tier: paraphrased queries reuse the cache key of a similar
+# earlier query. Per tool, normalized query embeddings live in one preallocated
+# (N, D) ring buffer, so inserts never reallocate and a lookup is one matmul.
+_SEMANTIC_THRESHOLD = 0.92
+_SEMANTIC_VECTORS: Dict[str, np.ndarray] = {}
+_SEMANTIC_KEYS: Dict[str, list[CacheKey]] = {}
+_SEMANTIC_INSERTS: Dict[str, int] = {}  # Total inserts per tool (next slot = count % N)
+
+def _embed_query(query: str) -> np.ndarray:
+    """Normalized embedding of a tool query (shared, memoized embedder)."""
+    embedding = get_embedder().embed(query.lower().strip())
+    return (embedding / np.linalg.norm(embedding)).astype(np.float32)
+
+def _find_similar_key(tool_name: str, embedding: np.ndarray) -> CacheKey | None:
+    """Cache key of the most similar remembered query, if close enough."""
+    with _CACHE_LOCK:
+        keys = _SEMANTIC_KEYS.get(tool_name)
+        if not keys:
+            return None
+        similarities = _SEMANTIC_VECTORS[tool_name][:len(keys)] @ embedding  # one BLAS GEMV
+        best = int(similarities.argmax())
+        if similarities[best] < _SEMANTIC_THRESHOLD:
+            return None
+        return keys[best]
+
+def _remember_query(tool_name: str, embedding: np.ndarray, key: CacheKey):
+    """Index a query embedding under its cache key, overwriting the oldest row when full."""
+    with _CACHE_LOCK:
+        if tool_name not in _SEMANTIC_VECTORS:
+            _SEMANTIC_VECTORS[tool_name] = np.zeros((_MEMORY_CACHE_MAX, embedding.shape[0]), dtype=np.float32)
+            _SEMANTIC_KEYS[tool_name] = []
+            _SEMANTIC_INSERTS[tool_name] = 0
+        keys = _SEMANTIC_KEYS[tool_name]
+        slot = _SEMANTIC_INSERTS[tool_name] % _MEMORY_CACHE_MAX
+        _SEMANTIC_VECTORS[tool_name][slot] = embedding
+        if slot < len(keys):
+            keys[slot] = key
         else:
-            del _TOOL_CACHE[key]  # Expired
-    return None
+            keys.append(key)
+        _SEMANTIC_INSERTS[tool_name] += 1
+
+def _cache_lookup(tool_name: str, query: str) -> tuple[str | None, CacheKey, np.ndarray | None]:
+    """Exact lookup, then semantic lookup when enabled. Returns (result, key, embedding)."""
+    cache_key = _get_cache_key(tool_name, query)
+    cached = _check_cache(cache_key)
+    embedding = None
+    if cached is None and Config.TOOL_SEMANTIC_CACHE:
+        embedding = _embed_query(query)
+        similar_key = _find_similar_key(tool_name, embedding)
+        if similar_key is not None:
+            cached = _check_cache(similar_key)
+    return cached, cache_key, embedding
+
+def _cache_store(tool_name: str, key: CacheKey, result: str, embedding: np.ndarray | None):
+    """Store a result and, if it was embedded, make it reachable by similar queries."""
+    _set_cache(key, result)
+    if embedding is not None:
+        _remember_query(tool_name, embedding, key)
+
+# Web snippets are trimmed before they are cached and handed to agents
+_WEB_BODY_MAX_CHARS = 500
+_WEB_MAX_RESULTS = 3
+
+# One DDGS session per thread (crew worker threads are long-lived); a session
+# is not safe to share between threads searching concurrently
+_DDGS_SESSIONS = threading.local()
+
+# Rows formatted per Cypher query (generated queries are told to LIMIT 20)
+_MAX_CYPHER_RECORDS = 20
+
+# Generic name search used when Cypher generation fails
+_FALLBACK_CYPHER = "MATCH (n:Entity) WHERE toLower(n.name) CONTAINS toLower($term) RETURN DISTINCT n LIMIT 10"
+
+# Single- or double-quoted Cypher string literal (with backslash escapes)
+_CYPHER_STRING = re.compile(r"'((?:[^'\\]|\\.)*)'" r'|"((?:[^"\\]|\\.)*)"')
+# Cypher escape sequences inside string literals
+_CYPHER_ESCAPE = re.compile(r"\\(u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|.)")
+_CYPHER_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f"}
+
+def _unescape_cypher(match: re.Match) -> str:
+    """Character a Cypher escape sequence stands for (\\' \\" \\\\ map to themselves)."""
+    escape = match.group(1)
+    if len(escape) > 1:
+        return chr(int(escape[1:], 16))
+    return _CYPHER_ESCAPES.get(escape, escape)
+
+def _parameterize_literals(cypher: str) -> tuple[str, dict]:
+    """
+    Move string literals of a generated query into parameters ($s0, $s1, ...).
+
+    Queries that differ only in the searched terms then share one query
+    string, so Neo4j reuses the cached plan instead of planning each call.
+    """
+    params = {}
+
+    def to_param(match: re.Match) -> str:
+        literal = match.group(1) if match.group(1) is not None else match.group(2)
+        name = f"s{len(params)}"
+        params[name] = _CYPHER_ESCAPE.sub(_unescape_cypher, literal)
+        return f"${name}"
+
+    return _CYPHER_STRING.sub(to_param, cypher), params
+
+# NL->Cypher instructions: constant, so every request shares the same prefix
+_CYPHER_SYSTEM_PROMPT = """You are an expert Neo4j Cypher query generator.
+
+Database Schema:
+Nodes:
+ - Entity (properties: name, summary)
+ - Episodic (properties: content, source)
+ - Community (properties: name, summary)
+
+Relationships:
+ - (:Entity)-[:RELATES_TO {fact: "..."}]->(:Entity)
+ - (:Episodic)-[:MENTIONS]->(:Entity)
+
+Rules:
+1. Return ONLY the Cypher query. No markdown, no explanations.
+2. Use case-insensitive matching: toLower(n.name) CONTAINS toLower('term').
+3. Search 'name' and 'summary' properties of Entity nodes.
+4. For "alternatives" or "similar", look for shared properties or relationships in the summary.
+5. Always LIMIT results to 20.
+6. Do not use procedures like apoc.* or db.*.
+7. CRITICAL: If using UNION, you MUST use aliases to ensure identical column names across all parts (e.g. RETURN n.name AS Name, n.summary AS Info).
+8. When looking for relationships (interactions, contraindications), check the 'fact' property on RELATES_TO edges.
+9. ALWAYS use DISTINCT in your RETURN clause to prevent duplicate rows (e.g. RETURN DISTINCT ...).
+10. IMPORTANT: Do NOT put conditions inside the relationship pattern like [:RELATES_TO {fact: ...}]. Instead, use the WHERE clause: MATCH ...-[r:RELATES_TO]-... WHERE toLower(r.fact) CONTAINS ...
+"""
 
-def _set_cache(tool_name: str, query: str, result: str):
-    """Store result in cache with timestamp."""
-    key = _get_cache_key(tool_name, query)
-    _TOOL_CACHE[key] = (result, datetime.now())
+async def _fetch_records(tx, cypher: str, params: dict) -> list[dict]:
+    """Run a query and return at most _MAX_CYPHER_RECORDS rows as dicts."""
+    result = await tx.run(cypher, params)
+    # Pull only the rows we format; the rest are discarded with the transaction
+    return [record.data() for record in await result.fetch(_MAX_CYPHER_RECORDS)]
 
 class SearchInput(BaseModel):
     """Input for search tools with automatic dict-to-string conversion."""
@@ -62,25 +257,39 @@ class WebSearchTool(BaseTool):
     description: str = "Search the web for medical information not found in the graph."
     args_schema: Type[BaseModel] = SearchInput
 
+    def _get_ddgs(self) -> DDGS:
+        """DDGS session of the calling thread, reused so its HTTP connections stay warm."""
+        ddgs = getattr(_DDGS_SESSIONS, "ddgs", None)
+        if ddgs is None:
+            ddgs = _DDGS_SESSIONS.ddgs = DDGS()
+        return ddgs
+
     def _run(self, query: str) -> str:
         logger.info(f"Web Search - Query: {query}")
         
-        # Check cache first
-        cached = _check_cache("WebSearch", query)
+        # Check cache first (key is normalized once, reused to store)
+        cached, cache_key, embedding = _cache_lookup("WebSearch", query)
         if cached:
             logger.info("Web Search - Cache Hit")
             return f"[Cached] {cached}"
         
         try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=3))
-                if not results:
-                    logger.warning("Web Search - No results found")
-                    return "No web results found."
-                result = "\n".join([f"- {r['title']}: {r['body']}" for r in results])
-                _set_cache("WebSearch", query, result)
-                logger.info(f"Web Search - Success ({len(results)} results)")
-                return result
+            ddgs = self._get_ddgs()
+            # Consume the result generator lazily and stop at the hits we use;
+            # rows without a title or body are skipped
+            results = []
+            for r in ddgs.text(query, max_results=_WEB_MAX_RESULTS):
+                if r.get('title') and r.get('body'):
+                    results.append(r)
+                    if len(results) == _WEB_MAX_RESULTS:
+                        break
+            if not results:
+                logger.warning("Web Search - No results found")
+                return "No web results found."
+            result = "\n".join(f"- {r['title']}: {r['body'][:_WEB_BODY_MAX_CHARS]}" for r in results)
+            _cache_store("WebSearch", cache_key, result, embedding)
+            logger.info(f"Web Search - Success ({len(results)} results)")
+            return result
         except Exception as e:
             logger.error(f"Web Search - Error: {e}")
             return f"Web search failed: {e}"
@@ -91,27 +300,22 @@ class GraphDBTool(BaseTool):
     args_schema: Type[BaseModel] = SearchInput
 
     def _run(self, query: str) -> str:
+        # Sync entry point: works from any thread, with or without a running loop
+        return _run_on_tool_loop(self._arun(query))
+
+    async def _arun(self, query: str) -> str:
         logger.info(f"Graph DB Search - Query: {query}")
         
-        # Check cache first
-        cached = _check_cache("GraphDB", query)
+        # Check cache first (key is normalized once, reused to store)
+        cached, cache_key, embedding = await asyncio.to_thread(_cache_lookup, "GraphDB", query)
         if cached:
             logger.info("Graph DB Search - Cache Hit")
             return f"[Cached] {cached}"
         
-        # Handle async context properly
-        try:
-            loop = asyncio.get_running_loop()
-            # In async context - need to handle differently
-            import nest_asyncio
-            nest_asyncio.apply()
-            result = asyncio.run(self._async_search(query))
-        except RuntimeError:
-            # No running loop - safe to use asyncio.run
-            result = asyncio.run(self._async_search(query))
+        result = await self._async_search(query)
         
         if result and "error" not in result.lower():
-            _set_cache("GraphDB", query, result)
+            await asyncio.to_thread(_cache_store, "GraphDB", cache_key, result, embedding)
             logger.info("Graph DB Search - Success")
         else:
             logger.warning("Graph DB Search - No results")
@@ -119,8 +323,9 @@ class GraphDBTool(BaseTool):
         return result
 
     async def _async_search(self, query: str) -> str:
-        client = await get_graphiti_client()
         try:
+            # Long-lived client of the calling loop (never closed per query)
+            client = await get_shared_graphiti_client()
             results = await client.search_(query, config=COMBINED_HYBRID_SEARCH_RRF)
             if not results: 
                 return "No info in graph."
@@ -139,8 +344,6 @@ class GraphDBTool(BaseTool):
             return "\n".join(info) if info else "No relevant graph data."
         except Exception as e:
             return f"Graph search error: {e}"
-        finally:
-            await client.close()
 
 class CypherQueryTool(BaseTool):
     name: str = "Cypher Query Executor"
@@ -154,21 +357,14 @@ class CypherQueryTool(BaseTool):
     - 'List contraindications for bleeding disorder patients'
     """
     args_schema: Type[BaseModel] = SearchInput
-    _driver: Optional[Any] = None  # Private field for Neo4j driver
     _llm_client: Optional[Any] = None # Private field for LLM client
     
     def __init__(self):
         super().__init__()
-        # Initialize driver on first use (lazy loading)
     
     def _get_driver(self):
-        """Lazy load Neo4j driver."""
-        if self._driver is None:
-            self._driver = GraphDatabase.driver(
-                Config.NEO4J_URI,
-                auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD)
-            )
-        return self._driver
+        """Pooled async Neo4j driver, bound to the tool loop (closed with it)."""
+        return get_async_driver()
 
     def _get_llm_client(self):
         """Lazy load Groq client."""
@@ -177,77 +373,56 @@ class CypherQueryTool(BaseTool):
         return self._llm_client
     
     def _run(self, query: str) -> str:
+        # Sync entry point: the async driver lives on the tool loop
+        return _run_on_tool_loop(self._arun(query))
+
+    async def _arun(self, query: str) -> str:
         logger.info(f"Cypher Query - Query: {query}")
         
-        # Convert natural language to Cypher
-        cypher_query = self._nl_to_cypher(query)
-        logger.info(f"Cypher Query - Generated: {cypher_query}")
+        # Convert natural language to Cypher (blocking Groq call, off the loop)
+        cypher_query, params = await asyncio.to_thread(self._nl_to_cypher, query)
+        logger.info(f"Cypher Query - Generated: {cypher_query} params={params}")
         
         try:
             driver = self._get_driver()
-            with driver.session() as session:
-                result = session.run(cypher_query)
-                records = [dict(record) for record in result]
-                
-                if not records:
-                    logger.warning("Cypher Query - No results")
-                    return "No matching data found in graph."
-                
-                # Format results
-                formatted = self._format_results(records)
-                logger.info(f"Cypher Query - Success ({len(records)} records)")
-                return formatted
+            # Read transaction (retried on transient errors) that ends as soon as
+            # the rows are fetched, before any formatting work
+            async with driver.session() as session:
+                records = await session.execute_read(_fetch_records, cypher_query, params)
+            
+            if not records:
+                logger.warning("Cypher Query - No results")
+                return "No matching data found in graph."
+            
+            # Format results
+            formatted = self._format_results(records)
+            logger.info(f"Cypher Query - Success ({len(records)} records)")
+            return formatted
                 
         except Exception as e:
             logger.error(f"Cypher Query - Error: {e}")
             return f"Cypher query error: {e}"
     
-    def _nl_to_cypher(self, query: str) -> str:
-        """Convert natural language to Cypher query using Groq LLM."""
+    def _nl_to_cypher(self, query: str) -> tuple[str, dict]:
+        """
+        Convert natural language to a Cypher query (and its parameters) using Groq LLM.
+        """
         try:
             client = self._get_llm_client()
             
-            schema_desc = """
-            Nodes: 
-             - Entity (properties: name, summary)
-             - Episodic (properties: content, source)
-             - Community (properties: name, summary)
-
-            Relationships:
-             - (:Entity)-[:RELATES_TO {fact: "..."}]->(:Entity)
-             - (:Episodic)-[:MENTIONS]->(:Entity)
-            """
-            
-            prompt = f"""
-            You are an expert Neo4j Cypher query generator.
-            
-            Database Schema:
-            {schema_desc}
-            
-            Task: Generate a Cypher query for: "{query}"
-            
-            Rules:
-            1. Return ONLY the Cypher query. No markdown, no explanations.
-            2. Use case-insensitive matching: toLower(n.name) CONTAINS toLower('term').
-            3. Search 'name' and 'summary' properties of Entity nodes.
-            4. For "alternatives" or "similar", look for shared properties or relationships in the summary.
-            5. Always LIMIT results to 20.
-            6. Do not use procedures like apoc.* or db.*.
-            7. CRITICAL: If using UNION, you MUST use aliases to ensure identical column names across all parts (e.g. RETURN n.name AS Name, n.summary AS Info).
-            8. When looking for relationships (interactions, contraindications), check the 'fact' property on RELATES_TO edges.
-            9. ALWAYS use DISTINCT in your RETURN clause to prevent duplicate rows (e.g. RETURN DISTINCT ...).
-            10. IMPORTANT: Do NOT put conditions inside the relationship pattern like [:RELATES_TO {{fact: ...}}]. Instead, use the WHERE clause: MATCH ...-[r:RELATES_TO]-... WHERE toLower(r.fact) CONTAINS ...
-            """
-            
-            completion = client.chat.completions.create(
-                model=Config.GROQ_MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that writes Cypher queries."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=500
-            )
+            # Static schema + rules lead the request and only the query varies at
+            # the tail, so Groq's prompt caching can reuse the prefix across calls
+            with get_groq_limiter():
+                completion = client.chat.completions.create(
+                    model=Config.GROQ_MODEL_NAME,
+                    messages=[
+                        {"role": "system", "content": _CYPHER_SYSTEM_PROMPT},
+                        {"role": "user", "content": f'Generate a Cypher query for: "{query}"'}
+                    ],
+                    temperature=0.1,
+                    max_tokens=500
+                )
+            self._log_prompt_usage(completion)
             
             cypher = completion.choices[0].message.content.strip()
             
@@ -255,46 +430,49 @@ class CypherQueryTool(BaseTool):
             if cypher.startswith("```"):
                 cypher = cypher.replace("```cypher", "").replace("```", "").strip()
                 
-            return cypher
+            return _parameterize_literals(cypher)
             
         except Exception as e:
             logger.error(f"LLM Cypher Generation Error: {e}")
-            # Fallback to a safe generic query
-            return f"MATCH (n:Entity) WHERE toLower(n.name) CONTAINS toLower('{query}') RETURN DISTINCT n LIMIT 10"
+            # Fallback to a safe generic query (parameterized: no injection, plan is reused)
+            return _FALLBACK_CYPHER, {"term": query}
+
+    @staticmethod
+    def _log_prompt_usage(completion):
+        """Log prompt tokens and, when reported, how many were served from the prompt cache."""
+        usage = getattr(completion, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None)
+        if cached is None:
+            x_groq = getattr(completion, "x_groq", None)
+            cached = getattr(getattr(x_groq, "usage", None), "cached_tokens", None)
+        logger.info(f"Cypher Query - Prompt tokens: {usage.prompt_tokens} (cached: {cached if cached is not None else 'n/a'})")
 
     def _format_results(self, records: list) -> str:
         """Format Cypher query results into a readable string."""
         if not records:
             return "No results found."
             
-        # Deduplicate records
+        # Deduplicate records (scalar rows hash directly; nested values such as
+        # node dicts fall back to a sorted repr)
         unique_records = []
         seen = set()
         
         for record in records:
-            # Create a hashable representation of the record
-            # Sort keys to ensure consistent ordering
-            # Convert values to string to handle non-hashable types if any
-            record_tuple = tuple(sorted((k, str(v)) for k, v in record.items()))
-            if record_tuple not in seen:
-                seen.add(record_tuple)
+            try:
+                record_key = frozenset(record.items())
+            except TypeError:
+                record_key = tuple(sorted((k, repr(v)) for k, v in record.items()))
+            if record_key not in seen:
+                seen.add(record_key)
                 unique_records.append(record)
         
-        formatted = []
-        for i, record in enumerate(unique_records, 1):
-            formatted.append(f"Result {i}:")
-            for key, value in record.items():
-                formatted.append(f"  - {key}: {value}")
-            formatted.append("")
-        return "\n".join(formatted)
-    
-    def __del__(self):
-        """Clean up Neo4j driver on deletion."""
-        if self._driver is not None:
-            try:
-                self._driver.close()
-            except:
-                pass
+        return "\n".join(
+            f"Result {i}:\n" + "".join(f"  - {key}: {value}\n" for key, value in record.items())
+            for i, record in enumerate(unique_records, 1)
+        )
 
 web_search_tool = WebSearchTool()
 graph_db_tool = GraphDBTool()
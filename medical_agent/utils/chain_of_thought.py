@@ -5,9 +5,78 @@ Implements explicit step-by-step reasoning for complex medical queries.
 Uses LLM to break down complex problems into logical steps.
 """
 
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Optional
 from crewai import LLM
+from groq import AsyncGroq
 from medical_agent.config import Config
+from medical_agent.graph.groq_client import get_groq_limiter
+
+# Section markers of the CoT response format (see prompt in process_with_cot)
+_STEP_PREFIX = "**Step"
+_REASONING = "Reasoning:"
+_CONCLUSION = "Conclusion:"
+_FINAL_ANSWER = "**FINAL ANSWER:**"
+_CONFIDENCE = "**CONFIDENCE LEVEL:**"
+_QUALITY = "**REASONING QUALITY:**"
+
+# Parser states: before the first step, inside a step, in the final answer, after it
+_PRE, _IN_STEP, _IN_FINAL, _POST = range(4)
+
+def _marker_value(line: str, marker: str) -> Optional[str]:
+    """Lowercased text after ``marker`` up to the next ** marker (None if absent)."""
+    start = line.find(marker)
+    if start == -1:
+        return None
+    return line[start + len(marker):].split("**", 1)[0].lower()
+
+# Instructions and output format of process_with_cot (constant, so they form a
+# cacheable prefix; only the query, steps and data are built per call)
+_COT_SYSTEM_PROMPT = """You are a medical AI assistant using Chain of Thought reasoning.
+
+**INSTRUCTIONS:**
+Think through the user's problem step-by-step following the reasoning steps provided.
+For each step:
+1. State what you're analyzing
+2. Show your reasoning
+3. State your conclusion for that step
+
+Format your response as:
+
+**Step 1: [Step name]**
+Reasoning: [Your detailed reasoning]
+Conclusion: [What you concluded]
+
+**Step 2: [Step name]**
+Reasoning: [Your detailed reasoning]
+Conclusion: [What you concluded]
+
+[Continue for all steps...]
+
+**FINAL ANSWER:**
+[Synthesized answer based on all steps]
+
+**CONFIDENCE LEVEL:** [High/Medium/Low]
+**REASONING QUALITY:** [Strong/Adequate/Weak] - explain why"""
+
+# System prompts of the parallel mode (constant, so they form a cacheable prefix)
+_STEP_SYSTEM_PROMPT = """You are a medical AI assistant working through ONE step of a larger
+Chain of Thought analysis. Analyze only the given step, using the research data
+and any prior conclusions provided.
+
+Format your response as:
+Reasoning: [Your detailed reasoning]
+Conclusion: [What you concluded]"""
+
+_SYNTHESIS_SYSTEM_PROMPT = """You are a medical AI assistant. Combine the step-by-step conclusions
+you are given into one answer to the user's query.
+
+Format your response as:
+**FINAL ANSWER:**
+[Synthesized answer based on all steps]
+
+**CONFIDENCE LEVEL:** [High/Medium/Low]
+**REASONING QUALITY:** [Strong/Adequate/Weak] - explain why"""
 
 
 class ChainOfThoughtProcessor:
@@ -28,6 +97,8 @@ class ChainOfThoughtProcessor:
             temperature=0.2,  # Slightly higher for creative reasoning
             max_tokens=2000  # Allow longer reasoning chains
         )
+        self.max_parallel_steps = 4  # Concurrent step calls in parallel mode
+        self._async_client = None
     
     def process_with_cot(
         self, 
@@ -47,9 +118,8 @@ class ChainOfThoughtProcessor:
             Dict with 'reasoning_chain' and 'final_answer'
         """
         
-        prompt = f"""You are a medical AI assistant using Chain of Thought reasoning.
-
-**USER QUERY:** "{query}"
+        # Only the query, steps and data vary; the instructions are a constant prefix
+        prompt = f"""**USER QUERY:** "{query}"
 
 **REASONING STEPS TO FOLLOW:**
 {self._format_steps(reasoning_steps)}
@@ -57,35 +127,14 @@ class ChainOfThoughtProcessor:
 **AVAILABLE RESEARCH DATA:**
 {research_findings if research_findings else "No research data provided yet."}
 
-**INSTRUCTIONS:**
-Think through this problem step-by-step following the reasoning steps above.
-For each step:
-1. State what you're analyzing
-2. Show your reasoning
-3. State your conclusion for that step
-
-Format your response as:
-
-**Step 1: [Step name]**
-Reasoning: [Your detailed reasoning]
-Conclusion: [What you concluded]
-
-**Step 2: [Step name]**
-Reasoning: [Your detailed reasoning]
-Conclusion: [What you concluded]
-
-[Continue for all steps...]
-
-**FINAL ANSWER:**
-[Synthesized answer based on all steps]
-
-**CONFIDENCE LEVEL:** [High/Medium/Low]
-**REASONING QUALITY:** [Strong/Adequate/Weak] - explain why
-
 Begin your step-by-step reasoning:"""
 
         try:
-            response = self.llm.call([{"role": "user", "content": prompt}])
+            with get_groq_limiter():
+                response = self.llm.call([
+                    {"role": "system", "content": _COT_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ])
             
             # Parse response into structured format
             return self._parse_cot_response(response, reasoning_steps)
@@ -100,90 +149,223 @@ Begin your step-by-step reasoning:"""
                 "error": str(e)
             }
     
+    async def process_with_cot_async(
+        self,
+        query: str,
+        reasoning_steps: List[str],
+        research_findings: str = "",
+        dependencies: Optional[List[List[int]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply Chain of Thought reasoning with independent steps run concurrently.
+        
+        Each step is its own LLM call (at most max_parallel_steps at once),
+        followed by one synthesis call, so latency is roughly the slowest step
+        plus synthesis instead of one long sequential generation.
+        
+        Args:
+            query: User's medical query
+            reasoning_steps: List of reasoning steps from router
+            research_findings: Data gathered by research agent
+            dependencies: Per step, indices of earlier steps whose conclusions
+                it needs, e.g. from the router (default, or when malformed:
+                each step needs all earlier ones, i.e. a sequential chain)
+            
+        Returns:
+            Same dict as process_with_cot
+        """
+        dependencies = self._step_dependencies(dependencies, len(reasoning_steps))
+        findings = research_findings if research_findings else "No research data provided yet."
+        semaphore = asyncio.Semaphore(self.max_parallel_steps)
+        tasks: List[asyncio.Task] = []
+        
+        async def run_step(index: int, step: str) -> Dict[str, str]:
+            # Only earlier steps can be dependencies, so there are no cycles
+            prior = [await tasks[j] for j in dependencies[index] if j < index]
+            content = f'**USER QUERY:** "{query}"\n\n**STEP {index + 1}:** {step}\n\n**AVAILABLE RESEARCH DATA:**\n{findings}'
+            if prior:
+                content += "\n\n**PRIOR CONCLUSIONS:**\n" + "\n".join(
+                    f"- {p['step']}: {p['conclusion']}" for p in prior
+                )
+            async with semaphore:
+                text = await self._acomplete(_STEP_SYSTEM_PROMPT, content, max_tokens=600)
+            return self._parse_step(step, text)
+        
+        try:
+            for index, step in enumerate(reasoning_steps):
+                tasks.append(asyncio.create_task(run_step(index, step)))
+            reasoning_chain = await asyncio.gather(*tasks)
+            
+            summary = "\n".join(
+                f"**Step {i}: {s['step']}**\nConclusion: {s['conclusion']}"
+                for i, s in enumerate(reasoning_chain, 1)
+            )
+            synthesis = await self._acomplete(
+                _SYNTHESIS_SYSTEM_PROMPT,
+                f'**USER QUERY:** "{query}"\n\n**STEP CONCLUSIONS:**\n{summary}\n\n**AVAILABLE RESEARCH DATA:**\n{findings}',
+                max_tokens=1000
+            )
+            
+            result = self._parse_cot_response(synthesis, reasoning_steps)
+            result["reasoning_chain"] = list(reasoning_chain)
+            result["full_response"] = f"{summary}\n\n{synthesis}"
+            return result
+            
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            print(f"⚠️  Parallel CoT reasoning failed: {e}")
+            return {
+                "reasoning_chain": [],
+                "final_answer": research_findings,
+                "confidence": "low",
+                "reasoning_quality": "weak",
+                "error": str(e)
+            }
+    
+    async def _acomplete(self, system: str, content: str, max_tokens: int) -> str:
+        """One async Groq chat completion (static instructions first, for prompt caching)."""
+        if self._async_client is None:
+            self._async_client = AsyncGroq(api_key=Config.GROQ_API_KEY)
+        async with get_groq_limiter():
+            completion = await self._async_client.chat.completions.create(
+                model=Config.GROQ_MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": content}
+                ],
+                temperature=0.2,
+                max_tokens=max_tokens
+            )
+        return completion.choices[0].message.content or ""
+    
+    def _parse_step(self, step: str, response: str) -> Dict[str, str]:
+        """Parse a single-step response (Reasoning:/Conclusion: lines)."""
+        reasoning = []
+        conclusion = []
+        target = reasoning
+        for line in response.split('\n'):
+            line = line.strip()
+            if line.startswith(_REASONING):
+                target = reasoning
+                line = line[len(_REASONING):].strip()
+            elif line.startswith(_CONCLUSION):
+                target = conclusion
+                line = line[len(_CONCLUSION):].strip()
+            if line:
+                target.append(line)
+        return {
+            "step": step,
+            "reasoning": "\n".join(reasoning),
+            "conclusion": "\n".join(conclusion)
+        }
+    
+    @staticmethod
+    def _step_dependencies(dependencies: Optional[List[List[int]]], count: int) -> List[List[int]]:
+        """
+        Validated per-step dependency lists. Nothing here can tell which steps
+        are independent, so without a usable graph steps are treated as a chain.
+        """
+        if (
+            isinstance(dependencies, list) and len(dependencies) == count
+            and all(
+                isinstance(deps, list) and all(isinstance(j, int) and 0 <= j < i for j in deps)
+                for i, deps in enumerate(dependencies)
+            )
+        ):
+            return dependencies
+        return [list(range(i)) for i in range(count)]
+    
     def _format_steps(self, steps: List[str]) -> str:
         """Format reasoning steps as numbered list."""
         return "\n".join([f"{i+1}. {step}" for i, step in enumerate(steps)])
     
     def _parse_cot_response(self, response: str, expected_steps: List[str]) -> Dict[str, Any]:
-        """Parse LLM's CoT response into structured format."""
+        """Parse LLM's CoT response into structured format (single pass over lines)."""
         
-        # Extract reasoning chain
         reasoning_chain = []
         current_step = None
         current_reasoning = []
         current_conclusion = None
+        final_parts = []
+        seen_final = False
+        confidence = None
+        reasoning_quality = None
+        state = _PRE
         
-        lines = response.split('\n')
-        for line in lines:
-            line = line.strip()
+        def save_step():
+            if current_step is not None:
+                reasoning_chain.append({
+                    "step": current_step,
+                    "reasoning": "\n".join(current_reasoning).strip(),
+                    "conclusion": current_conclusion or ""
+                })
+        
+        for raw in response.split('\n'):
+            # The first FINAL ANSWER marker may sit anywhere on its line
+            if not seen_final:
+                start = raw.find(_FINAL_ANSWER)
+                if start != -1:
+                    seen_final = True
+                    save_step()
+                    current_step = None
+                    raw = raw[start + len(_FINAL_ANSWER):]
+                    state = _IN_FINAL
+            
+            if state == _IN_FINAL:
+                # Take until next ** marker; lines stay unstripped so nested
+                # markdown keeps its indentation
+                answer, marker, rest = raw.partition("**")
+                final_parts.append(answer)
+                if not marker:
+                    continue
+                raw = marker + rest  # may still carry the confidence/quality markers
+                state = _POST
+            
+            graded = False
+            rest = _marker_value(raw, _CONFIDENCE)
+            if rest is not None:
+                graded = True
+                if confidence is None:
+                    confidence = "high" if "high" in rest else "low" if "low" in rest else "medium"
+            rest = _marker_value(raw, _QUALITY)
+            if rest is not None:
+                graded = True
+                if reasoning_quality is None:
+                    reasoning_quality = "strong" if "strong" in rest else "weak" if "weak" in rest else "adequate"
+            if graded:
+                state = _POST
+                continue
+            
+            if state == _POST:
+                continue
+            
+            line = raw.strip()
             
             # Detect step headers
-            if line.startswith('**Step') and ':**' in line:
-                # Save previous step if exists
-                if current_step is not None:
-                    reasoning_chain.append({
-                        "step": current_step,
-                        "reasoning": "\n".join(current_reasoning).strip(),
-                        "conclusion": current_conclusion or ""
-                    })
-                
-                # Start new step
-                current_step = line.split(':**')[1].strip() if ':**' in line else line
+            if line.startswith(_STEP_PREFIX) and ':**' in line:
+                save_step()
+                current_step = line.split(':**', 1)[1].strip()
                 current_reasoning = []
                 current_conclusion = None
-                
-            elif line.startswith('Reasoning:'):
-                current_reasoning.append(line.replace('Reasoning:', '').strip())
-            elif line.startswith('Conclusion:'):
-                current_conclusion = line.replace('Conclusion:', '').strip()
-            elif current_step is not None and line and not line.startswith('**'):
+                state = _IN_STEP
+            elif state != _IN_STEP:
+                continue
+            elif line.startswith(_REASONING):
+                current_reasoning.append(line[len(_REASONING):].strip())
+            elif line.startswith(_CONCLUSION):
+                current_conclusion = line[len(_CONCLUSION):].strip()
+            elif line and not line.startswith('**'):
                 current_reasoning.append(line)
         
-        # Save last step
-        if current_step is not None:
-            reasoning_chain.append({
-                "step": current_step,
-                "reasoning": "\n".join(current_reasoning).strip(),
-                "conclusion": current_conclusion or ""
-            })
-        
-        # Extract final answer
-        final_answer = ""
-        if "**FINAL ANSWER:**" in response:
-            parts = response.split("**FINAL ANSWER:**")
-            if len(parts) > 1:
-                answer_section = parts[1]
-                # Take until next ** marker or end
-                if "**" in answer_section:
-                    final_answer = answer_section.split("**")[0].strip()
-                else:
-                    final_answer = answer_section.strip()
-        
-        # Extract confidence and quality
-        confidence = "medium"
-        reasoning_quality = "adequate"
-        
-        if "**CONFIDENCE LEVEL:**" in response:
-            conf_line = [l for l in lines if "CONFIDENCE LEVEL" in l]
-            if conf_line:
-                if "high" in conf_line[0].lower():
-                    confidence = "high"
-                elif "low" in conf_line[0].lower():
-                    confidence = "low"
-        
-        if "**REASONING QUALITY:**" in response:
-            qual_line = [l for l in lines if "REASONING QUALITY" in l]
-            if qual_line:
-                if "strong" in qual_line[0].lower():
-                    reasoning_quality = "strong"
-                elif "weak" in qual_line[0].lower():
-                    reasoning_quality = "weak"
+        # Save last step (response ended without a final answer)
+        save_step()
         
         return {
             "reasoning_chain": reasoning_chain,
-            "final_answer": final_answer,
-            "confidence": confidence,
-            "reasoning_quality": reasoning_quality,
+            "final_answer": "\n".join(final_parts).strip(),
+            "confidence": confidence or "medium",
+            "reasoning_quality": reasoning_quality or "adequate",
             "full_response": response
         }
     
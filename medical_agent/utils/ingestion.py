@@ -7,8 +7,13 @@ os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 
 import asyncio
 import logging
+import random
+import time
+from collections import defaultdict
 from pathlib import Path
 from chonkie import RecursiveChunker
+from graphiti_core.nodes import EpisodeType
+from graphiti_core.utils.bulk_utils import RawEpisode
 from medical_agent.graph.client import get_graphiti_client
 from medical_agent.config import Config
 from datetime import datetime, timezone
@@ -17,6 +22,27 @@ from datetime import datetime, timezone
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pacing after a successful episode: only slow down while the provider has
+# recently returned 429s, otherwise send the next chunk immediately
+RATE_LIMIT_COOLDOWN = 60.0  # seconds a 429 keeps pacing active
+PACING_DELAY = (1.0, 3.0)    # jittered pause range while pacing
+
+# Rate-limit hints in Groq errors: "try again in 3m42.04s" / "try again in 2.5s"
+_RETRY_IN_MINUTES = re.compile(r"try again in (\d+)m(\d+(?:\.\d+)?)s")
+_RETRY_IN_SECONDS = re.compile(r"try again in (\d+(?:\.\d+)?)s")
+
+# Global chunker instance (singleton; tokenizer setup happens once)
+_chunker = None
+
+def get_chunker() -> RecursiveChunker:
+    """Get or create the shared Chonkie chunker."""
+    global _chunker
+    if _chunker is None:
+        # RecursiveChunker in this version does not support chunk_overlap
+        # Reducing chunk_size to 300 to avoid hitting TPM limits
+        _chunker = RecursiveChunker(chunk_size=300)
+    return _chunker
+
 async def ingest():
     # 1. Read Data
     file_path = Path("data/drugs.txt")
@@ -27,83 +53,115 @@ async def ingest():
              logger.error(f"File not found: {file_path}")
              return
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        text = f.read()
+    # File read and chunking are blocking; keep them off the event loop
+    text = await asyncio.to_thread(file_path.read_text, encoding="utf-8")
 
     logger.info(f"Read {len(text)} characters from {file_path}")
 
-    # 2. Chunk Data using Chonkie
+    # 2. Initialize Graphiti and start building indices in the background;
+    #    index DDL does not depend on chunk content, so it overlaps chunking
+    try:
+        logger.info("Initializing Graphiti client...")
+        graphiti = await get_graphiti_client()
+        indices_task = asyncio.create_task(graphiti.build_indices_and_constraints())
+    except Exception as e:
+        logger.error(f"Failed to initialize Graphiti: {e}")
+        return
+
+    # 3. Chunk Data using Chonkie
     logger.info("Chunking text with Chonkie...")
-    # RecursiveChunker in this version does not support chunk_overlap
-    # Reducing chunk_size to 300 to avoid hitting TPM limits
-    chunker = RecursiveChunker(
-        chunk_size=300
-    )
-    chunks = chunker.chunk(text)
+    chunks = await asyncio.to_thread(get_chunker().chunk, text)
     
     logger.info(f"Generated {len(chunks)} chunks")
 
-    # 3. Initialize Graphiti
+    # Ensure indices are built before the first episode is added
     try:
-        logger.info("Initializing Graphiti client...")
-        graphiti = await get_graphiti_client()
-        # Ensure indices are built
-
-# Alias for backward compatibility
-ingest_text = ingest
-        await graphiti.build_indices_and_constraints()
+        await indices_task
     except Exception as e:
-        logger.error(f"Failed to initialize Graphiti: {e}")
+        logger.error(f"Failed to build Graphiti indices: {e}")
+        await graphiti.close()
         return
 
-    # 4. Ingest Chunks
+    # 4. Ingest Chunks in batches: one add_episode_bulk call shares entity
+    #    resolution and Neo4j writes across a whole batch. Graphiti resolves
+    #    entities against what is already written, so batches of the same
+    #    group run one at a time (parallel ones would duplicate entities and
+    #    edges); only different groups overlap, bounded by the semaphore.
+    #    429 retries handle pacing.
     group_id = "medical_docs"
-    
-    for i, chunk in enumerate(chunks):
-        logger.info(f"Ingesting chunk {i+1}/{len(chunks)}...")
-        
-        content = chunk.text
-        
-        max_retries = 10
-        for attempt in range(max_retries):
-            try:
-                await graphiti.add_episode(
-                    name=f"Drug Info Chunk {i+1}",
-                    episode_body=content,
-                    source_description=f"drugs.txt chunk {i+1}",
-                    group_id=group_id,
-                    reference_time=datetime.now(timezone.utc)
-                )
-                logger.info(f"Successfully added chunk {i+1}")
-                
-                # Standard delay between successful chunks to be nice to the API
-                await asyncio.sleep(5)
-                break # Success, exit retry loop
-                
-            except Exception as e:
-                error_str = str(e)
-                if "429" in error_str or "Rate limit" in error_str:
-                    # Try to extract wait time
-                    wait_time = 60 # Default wait
+    semaphore = asyncio.Semaphore(Config.INGEST_CONCURRENCY)
+    group_locks = defaultdict(asyncio.Lock)
+    last_rate_limit = None  # monotonic time of the most recent 429
+    batch_size = Config.INGEST_BATCH_SIZE
+    batches = [
+        [
+            RawEpisode(
+                name=f"Drug Info Chunk {i+1}",
+                content=chunk.text,
+                source_description=f"drugs.txt chunk {i+1}",
+                source=EpisodeType.text,
+                reference_time=datetime.now(timezone.utc)
+            )
+            for i, chunk in enumerate(chunks[start:start + batch_size], start)
+        ]
+        for start in range(0, len(chunks), batch_size)
+    ]
+
+    async def ingest_batch(b, episodes):
+        nonlocal last_rate_limit
+        # Group lock first: waiting on it must not hold a concurrency slot
+        async with group_locks[group_id], semaphore:
+            first, last = b * batch_size + 1, b * batch_size + len(episodes)
+            logger.info(f"Ingesting chunks {first}-{last}/{len(chunks)}...")
+            
+            max_retries = 10
+            for attempt in range(max_retries):
+                try:
+                    await graphiti.add_episode_bulk(episodes, group_id=group_id)
+                    logger.info(f"Successfully added chunks {first}-{last}")
                     
-                    # Regex for "try again in 3m42.04s"
-                    match_m = re.search(r"try again in (\d+)m(\d+(\.\d+)?)s", error_str)
-                    if match_m:
-                        wait_time = int(match_m.group(1)) * 60 + float(match_m.group(2)) + 5
-                    else:
-                        # Regex for "try again in 2.5s"
-                        match_s = re.search(r"try again in (\d+(\.\d+)?)s", error_str)
-                        if match_s:
-                            wait_time = float(match_s.group(1)) + 5
+                    # Back off gently only while we are close to the rate limit
+                    if last_rate_limit is not None and time.monotonic() - last_rate_limit < RATE_LIMIT_COOLDOWN:
+                        await asyncio.sleep(random.uniform(*PACING_DELAY))
+                    break # Success, exit retry loop
                     
-                    logger.warning(f"Rate limit hit. Waiting {wait_time:.2f}s before retry {attempt+1}/{max_retries}...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"Error adding chunk {i+1}: {e}")
-                    break # Non-retryable error
+                except Exception as e:
+                    error_str = str(e)
+                    if "429" in error_str or "Rate limit" in error_str:
+                        last_rate_limit = time.monotonic()
+                        
+                        # Try to extract wait time
+                        wait_time = 60 # Default wait
+                        
+                        match_m = _RETRY_IN_MINUTES.search(error_str)
+                        if match_m:
+                            wait_time = int(match_m.group(1)) * 60 + float(match_m.group(2)) + 5
+                        else:
+                            match_s = _RETRY_IN_SECONDS.search(error_str)
+                            if match_s:
+                                wait_time = float(match_s.group(1)) + 5
+                        
+                        logger.warning(f"Rate limit hit. Waiting {wait_time:.2f}s before retry {attempt+1}/{max_retries}...")
+                        await asyncio.sleep(wait_time)
+                    else:
+                        logger.error(f"Error adding chunks {first}-{last}: {e}")
+                        break # Non-retryable error
+            else:
+                logger.error(f"Giving up on chunks {first}-{last}: still rate limited after {max_retries} attempts")
+
+    results = await asyncio.gather(
+        *(ingest_batch(b, episodes) for b, episodes in enumerate(batches)),
+        return_exceptions=True
+    )
+    for b, result in enumerate(results):
+        if isinstance(result, BaseException):
+            logger.error(f"Batch {b + 1}/{len(batches)} failed: {result!r}")
 
     await graphiti.close()
     logger.info("Ingestion complete.")
 
+# Alias for backward compatibility
+ingest_text = ingest
+
 # if __name__ == "__main__":
 #     asyncio.run(ingest())
@@ -9,10 +9,17 @@ This module uses LLM reasoning to:
 """
 
 import json
+import re
+import zlib
+import diskcache
+import orjson
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from crewai import LLM
 from medical_agent.config import Config
+from medical_agent.graph.groq_client import get_groq_limiter
+from medical_agent.utils.semantic_cache import SemanticCache, key_terms
 import numpy as np
 
 @dataclass
@@ -29,52 +36,51 @@ class QueryAnalysis:
     rejection_message: Optional[str]  # If query should be rejected
     use_chain_of_thought: bool  # Whether to use CoT reasoning
     cot_reasoning_steps: Optional[List[str]]  # CoT steps if applicable
+    cot_step_dependencies: Optional[List[List[int]]] = None  # Per CoT step, earlier steps it builds on
 
 
-class IntelligentRouter:
-    """LLM-powered intelligent query routing system."""
-    
-    def __init__(self):
-        """Initialize router with lightweight LLM for fast analysis."""
-        # Use Groq for fast routing decisions (70B model for smart reasoning)
-        self.routing_llm = LLM(
-            model="groq/llama-3.3-70b-versatile",
-            api_key=Config.GROQ_API_KEY,
-            temperature=0.0,  # Deterministic routing decisions
-            max_tokens=500  # Keep routing fast
-        )
-        
-        # Semantic cache for embeddings (if available)
-        self.semantic_cache = {}
-        self.cache_threshold = 0.92  # Cosine similarity threshold
-        
-    def analyze_query(self, query: str) -> QueryAnalysis:
-        """
-        Use LLM to intelligently analyze query and determine optimal routing.
-        
-        This is the AI senior's approach - let the LLM reason about the query
-        instead of using brittle keyword matching.
-        """
-        
-        prompt = f"""You are an expert medical AI system architect. Analyze this user query and determine the optimal agent configuration.
+# Cheap prefilter for obviously off-topic traffic (greetings, weather, markets...).
+# Only whole-string greetings and short queries made up entirely of off-topic
+# and filler words are rejected without the LLM; anything else ("can weather
+# trigger migraines?") goes to the router.
+_GREETING = re.compile(
+    r"^\s*(hi|hello|hey|yo|thanks|thank you|good (morning|afternoon|evening)|bye|goodbye|test(ing)?)\s*[!.?]*\s*$",
+    re.IGNORECASE
+)
+_WORD = re.compile(r"[a-z0-9]+")
+_OFF_TOPIC_WORDS = frozenset({
+    "weather", "forecast", "stock", "stocks", "bitcoin", "crypto", "football", "soccer",
+    "movie", "movies", "recipe", "recipes", "joke", "jokes", "lottery"
+})
+_FILLER_WORDS = frozenset({
+    "what", "whats", "s", "is", "the", "a", "an", "of", "for", "in", "today", "tomorrow",
+    "now", "price", "tell", "me", "give", "show", "how", "good", "any", "some", "latest", "news"
+})
+_PREFILTER_MAX_WORDS = 6
+
 
-USER QUERY: "{query}"
+# Outermost {...} of the routing LLM's reply
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+# Routing instructions (constant, so every analysis shares a cacheable prefix)
+_ROUTER_SYSTEM_PROMPT = """You are an expert medical AI system architect. Analyze the user query and determine the optimal agent configuration.
 
 Analyze the query and respond with ONLY valid JSON (no markdown, no explanation):
 
-{{
+{
   "is_medical": true/false,
   "confidence": 0.0-1.0,
   "intent": "drug_info|interaction|contraindication|side_effects|dosage|general_medical|non_medical",
   "complexity": 1-5,
   "required_agents": ["researcher", "validator", "analyst"],
-  "max_iterations": {{"researcher": 1-4, "validator": 1-3, "analyst": 1-2}},
+  "max_iterations": {"researcher": 1-4, "validator": 1-3, "analyst": 1-2},
   "reasoning": "Brief explanation of your decisions",
   "suggested_tools": ["graph_db", "cypher", "web_search"],
   "rejection_message": "Message if non-medical, else null",
   "use_chain_of_thought": true/false,
-  "cot_reasoning_steps": ["step1", "step2", "step3"] or null
-}}
+  "cot_reasoning_steps": ["step1", "step2", "step3"] or null,
+  "cot_step_dependencies": [[], [0], [0, 1]] or null
+}
 
 ANALYSIS GUIDELINES:
 
@@ -131,46 +137,157 @@ If use_chain_of_thought=true, provide 3-5 reasoning steps:
 Example: ["Identify all drugs mentioned", "Check each drug for contraindications", "Evaluate drug-drug interactions", "Assess combined risk level", "Formulate recommendation"]
 If use_chain_of_thought=false, set to null
 
+**CoT Step Dependencies (cot_step_dependencies):**
+One list per reasoning step with the 0-based indices of EARLIER steps whose conclusions it needs.
+Use [] only for steps that can be reasoned about on their own.
+Example for the steps above: [[], [0], [0], [1, 2], [3]]
+If use_chain_of_thought=false, set to null
+
 **Rejection Message:**
 - If non-medical: Polite message explaining you handle medical queries only
 - If medical: null
 
 Respond with ONLY the JSON object, nothing else."""
+_ROUTER_SYSTEM_MESSAGE = {"role": "system", "content": _ROUTER_SYSTEM_PROMPT}
 
-        try:
-            # Get LLM analysis
-            response = self.routing_llm.call([{"role": "user", "content": prompt}])
-            
-            # Parse response (remove markdown if present)
-            response_text = response.strip()
-            if response_text.startswith("```"):
-                # Extract JSON from markdown code block
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-            
-            analysis_dict = json.loads(response_text)
-            
-            # Convert to dataclass
-            return QueryAnalysis(
-                is_medical=analysis_dict["is_medical"],
-                confidence=analysis_dict["confidence"],
-                intent=analysis_dict["intent"],
-                complexity=analysis_dict["complexity"],
-                required_agents=analysis_dict["required_agents"],
-                max_iterations=analysis_dict["max_iterations"],
-                reasoning=analysis_dict["reasoning"],
-                suggested_tools=analysis_dict["suggested_tools"],
-                rejection_message=analysis_dict.get("rejection_message"),
-                use_chain_of_thought=analysis_dict.get("use_chain_of_thought", False),
-                cot_reasoning_steps=analysis_dict.get("cot_reasoning_steps")
+# Per-call user message around the query
+_USER_PROMPT_HEAD = 'USER QUERY: "'
+_USER_PROMPT_TAIL = '"\n\nRespond with ONLY the JSON object, nothing else.'
+
+# Persistent analyses (survive restarts; shared by worker processes). Keys
+# carry a checksum of the prompt so editing it invalidates stale routings.
+_ANALYSIS_CACHE = diskcache.Cache(Config.ROUTER_CACHE_DIR)
+_ANALYSIS_TTL = 86400.0  # Routing decisions stay valid for 24 hours (seconds)
+_PROMPT_VERSION = zlib.crc32((_ROUTER_SYSTEM_PROMPT + _USER_PROMPT_HEAD + _USER_PROMPT_TAIL).encode())
+
+
+class IntelligentRouter:
+    """LLM-powered intelligent query routing system."""
+    
+    def __init__(self):
+        """Initialize router; the routing LLM and semantic cache are created on first use."""
+        self._routing_llm = None
+        self._semantic_cache = None
+    
+    @property
+    def semantic_cache(self) -> SemanticCache:
+        """
+        The router's own semantic cache. Kept apart from the /ask response
+        cache so router entries are never served to users as answers.
+        """
+        if self._semantic_cache is None:
+            self._semantic_cache = SemanticCache(quantize=Config.SEMANTIC_CACHE_INT8)
+        return self._semantic_cache
+    
+    @property
+    def routing_llm(self) -> LLM:
+        """Lazily built routing LLM (prefilter-only paths never construct it)."""
+        if self._routing_llm is None:
+            # Use Groq for fast routing decisions (70B model for smart reasoning)
+            self._routing_llm = LLM(
+                model="groq/llama-3.3-70b-versatile",
+                api_key=Config.GROQ_API_KEY,
+                temperature=0.0,  # Deterministic routing decisions
+                max_tokens=500  # Keep routing fast
             )
-            
+        return self._routing_llm
+        
+    def analyze_query(self, query: str) -> QueryAnalysis:
+        """
+        Use LLM to intelligently analyze query and determine optimal routing.
+        
+        This is the AI senior's approach - let the LLM reason about the query
+        instead of using brittle keyword matching.
+        
+        Results are memoized per normalized query (case and whitespace
+        insensitive), in memory and on disk, so repeated questions skip the
+        LLM round-trip even across restarts. Fallback analyses are not cached.
+        """
+        normalized_query = " ".join(query.lower().split())
+        try:
+            return self._analyze_normalized(normalized_query)
         except Exception as e:
             # Fallback to safe defaults if LLM fails
             print(f"⚠️  Router LLM failed: {e}, using safe defaults")
             return self._fallback_analysis(query)
     
+    def prefilter(self, query: str) -> Optional[QueryAnalysis]:
+        """
+        Reject obviously non-medical queries ("hi", "what's the weather")
+        without an LLM call. Returns None when the router should decide.
+        """
+        if not (_GREETING.match(query) or self._is_off_topic(query)):
+            return None
+        
+        return QueryAnalysis(
+            is_medical=False,
+            confidence=0.95,
+            intent="non_medical",
+            complexity=1,
+            required_agents=[],
+            max_iterations={},
+            reasoning="Keyword prefilter: greeting or short off-topic query",
+            suggested_tools=[],
+            rejection_message="I'm a medical AI assistant. Please ask about medications, drug interactions, or medical conditions.",
+            use_chain_of_thought=False,
+            cot_reasoning_steps=None
+        )
+    
+    @staticmethod
+    def _is_off_topic(query: str) -> bool:
+        """True for short queries made only of off-topic and filler words."""
+        words = _WORD.findall(query.lower())
+        return (
+            0 < len(words) <= _PREFILTER_MAX_WORDS
+            and not _OFF_TOPIC_WORDS.isdisjoint(words)
+            and all(w in _OFF_TOPIC_WORDS or w in _FILLER_WORDS for w in words)
+        )
+    
+    @lru_cache(maxsize=256)
+    def _analyze_normalized(self, query: str) -> QueryAnalysis:
+        """Run the routing LLM on a normalized query (raises on failure)."""
+        cache_key = (_PROMPT_VERSION, query)
+        cached = _ANALYSIS_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Static instructions go first (byte-identical every call) so Groq's
+        # prompt cache can reuse them; only the query is sent per call
+        prompt = _USER_PROMPT_HEAD + query + _USER_PROMPT_TAIL
+
+        # Get LLM analysis
+        with get_groq_limiter():
+            response = self.routing_llm.call([
+                _ROUTER_SYSTEM_MESSAGE,
+                {"role": "user", "content": prompt}
+            ])
+        
+        # Parse response: take the outermost JSON object (ignores any code fence)
+        match = _JSON_OBJECT.search(response)
+        response_text = match.group(0) if match else response
+        try:
+            analysis_dict = orjson.loads(response_text)
+        except orjson.JSONDecodeError:
+            analysis_dict = json.loads(response_text)
+        
+        # Convert to dataclass
+        analysis = QueryAnalysis(
+            is_medical=analysis_dict["is_medical"],
+            confidence=analysis_dict["confidence"],
+            intent=analysis_dict["intent"],
+            complexity=analysis_dict["complexity"],
+            required_agents=analysis_dict["required_agents"],
+            max_iterations=analysis_dict["max_iterations"],
+            reasoning=analysis_dict["reasoning"],
+            suggested_tools=analysis_dict["suggested_tools"],
+            rejection_message=analysis_dict.get("rejection_message"),
+            use_chain_of_thought=analysis_dict.get("use_chain_of_thought", False),
+            cot_reasoning_steps=analysis_dict.get("cot_reasoning_steps"),
+            cot_step_dependencies=analysis_dict.get("cot_step_dependencies")
+        )
+        _ANALYSIS_CACHE.set(cache_key, analysis, expire=_ANALYSIS_TTL)
+        return analysis
+    
     def _fallback_analysis(self, query: str) -> QueryAnalysis:
         """Safe fallback if LLM routing fails."""
         # Conservative approach - assume it's medical and needs all agents
@@ -195,40 +312,27 @@ Respond with ONLY the JSON object, nothing else."""
         This is smarter than exact match - catches rephrased questions.
         Example: "aspirin side effects" and "what are adverse effects of aspirin" 
         would be cache hits despite different wording.
+        
+        Backed by a FAISS SemanticCache, so a lookup is one index search
+        instead of a Python loop over entries.
         """
-        if not embedding or not self.semantic_cache:
+        cache = self.semantic_cache
+        if not len(cache):
             return None
         
-        # Find most similar cached query
-        max_similarity = 0
-        best_match = None
-        
-        for cached_query, (cached_embedding, cached_response) in self.semantic_cache.items():
-            similarity = self._cosine_similarity(embedding, cached_embedding)
-            if similarity > max_similarity:
-                max_similarity = similarity
-                best_match = cached_response
-        
-        if max_similarity >= self.cache_threshold:
-            print(f"📦 Semantic cache hit! Similarity: {max_similarity:.3f}")
-            return best_match
+        query_vec = cache.embed(query) if embedding is None else cache.normalize(embedding)
+        hit = cache.search(query_vec, key_terms(query))
+        if hit is None:
+            return None
         
-        return None
+        entry, similarity = hit
+        print(f"📦 Semantic cache hit! Similarity: {similarity:.3f}")
+        return entry.response
     
     def add_to_semantic_cache(self, query: str, embedding: np.ndarray, response: str):
-        """Add query-response pair to semantic cache."""
-        self.semantic_cache[query] = (embedding, response)
-        
-        # Limit cache size (keep 100 most recent)
-        if len(self.semantic_cache) > 100:
-            # Remove oldest entry
-            oldest_key = list(self.semantic_cache.keys())[0]
-            del self.semantic_cache[oldest_key]
-    
-    @staticmethod
-    def _cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors."""
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+        """Add query-response pair to semantic cache (bounded; evicts by frequency/recency)."""
+        cache = self.semantic_cache
+        cache.add(cache.normalize(embedding), response, "router", key_terms(query))
 
 
 # Global router instance (singleton)
@@ -5,20 +5,35 @@ Executes multiple tool queries in parallel and merges results using LLM.
 """
 import asyncio
 import logging
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 from dataclasses import dataclass
+from cachetools import TTLCache
 from crewai import LLM
 from medical_agent.config import Config
+from medical_agent.graph.groq_client import get_groq_limiter
 from medical_agent.tools.medical_tools import (
     graph_db_tool, 
     cypher_query_tool, 
-    web_search_tool
+    web_search_tool,
+    run_on_tool_loop_async
 )
-import logging
 
 logger = logging.getLogger(__name__)
 
+# Context-selection hints, matched on word boundaries ("random" is not "and");
+# stems cover inflections such as "interactions" or "contraindicated"
+_CYPHER_HINT = re.compile(r"\b(?:interact\w*|contraindicat\w*|together|all|and)\b", re.IGNORECASE)
+_WEB_HINT = re.compile(r"\b(?:latest|new|recent\w*|study|studies|research\w*)\b", re.IGNORECASE)
+
+# Graph DB confidence at which MCP stops waiting for the other contexts
+_EARLY_EXIT_CONFIDENCE = 0.9
+
+# Bounded pool for the blocking tool and merge calls (shared by all requests)
+_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="mcp")
+
 @dataclass
 class ContextResult:
     """Result from a single context source."""
@@ -49,13 +64,21 @@ class MultiContextProcessor:
     """
     
     def __init__(self):
-        # Lightweight LLM for merging contexts
-        self.merger_llm = LLM(
-            model="groq/llama-3.3-70b-versatile",
-            api_key=Config.GROQ_API_KEY,
-            temperature=0.2,
-            max_tokens=800
-        )
+        self._merger_llm = None  # Created on first multi-source merge
+        # Merged results of recent queries, keyed by (normalized query, contexts)
+        self._results: TTLCache = TTLCache(maxsize=256, ttl=3600)
+    
+    @property
+    def merger_llm(self) -> LLM:
+        """Lightweight LLM for merging contexts (built lazily)."""
+        if self._merger_llm is None:
+            self._merger_llm = LLM(
+                model="groq/llama-3.3-70b-versatile",
+                api_key=Config.GROQ_API_KEY,
+                temperature=0.2,
+                max_tokens=800
+            )
+        return self._merger_llm
         
     async def process_query(
         self, 
@@ -78,30 +101,44 @@ class MultiContextProcessor:
         if contexts is None:
             contexts = self._select_contexts(query)
         
+        cache_key = (" ".join(query.lower().split()), tuple(sorted(contexts)))
+        cached = self._results.get(cache_key)
+        if cached is not None:
+            print(f"📦 MCP: Cache hit for contexts: {contexts}")
+            return cached
+        
         print(f"🔄 MCP: Processing with contexts: {contexts}")
         
         # Create async tasks for each context
         tasks = []
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         
         if 'graph_db' in contexts:
-            tasks.append(self._query_graph_db(query))
+            tasks.append(asyncio.create_task(self._query_graph_db(query)))
         if 'cypher' in contexts:
-            tasks.append(self._query_cypher(query))
+            tasks.append(asyncio.create_task(self._query_cypher(query)))
         if 'web' in contexts:
-            tasks.append(self._query_web(query))
+            tasks.append(asyncio.create_task(self._query_web(query)))
         
-        # Execute all in parallel with timeout
+        # Execute all in parallel with timeout, taking results as they finish;
+        # a high-confidence graph answer makes the slower sources unnecessary
+        results = []
         try:
-            results = await asyncio.wait_for(
-                asyncio.gather(*tasks, return_exceptions=True),
-                timeout=timeout
-            )
+            for next_done in asyncio.as_completed(tasks, timeout=timeout):
+                result = await next_done
+                results.append(result)
+                if (result.source == "graph_db" and result.confidence >= _EARLY_EXIT_CONFIDENCE
+                        and len(results) < len(tasks)):
+                    print(f"⚡ MCP: High-confidence graph answer, skipping remaining contexts")
+                    break
         except asyncio.TimeoutError:
             print(f"⏱️  MCP timeout after {timeout}s")
-            results = []
+        finally:
+            # Stop whatever is still running (early exit, timeout or error)
+            for task in tasks:
+                task.cancel()
         
-        total_latency = int((time.time() - start_time) * 1000)
+        total_latency = (time.perf_counter_ns() - start_time) // 1_000_000
         
         # Filter out errors and create ContextResults
         context_results = [r for r in results if isinstance(r, ContextResult)]
@@ -115,21 +152,25 @@ class MultiContextProcessor:
             if context_results else 0.0
         )
         
-        return MCPResult(
+        result = MCPResult(
             contexts=context_results,
             merged_content=merged_content,
             total_latency_ms=total_latency,
             sources_used=[r.source for r in context_results],
             confidence_score=avg_confidence
         )
+        # Timeouts and all-failed runs are not cached, so they are retried
+        if context_results:
+            self._results[cache_key] = result
+        return result
     
     async def _query_graph_db(self, query: str) -> ContextResult:
         """Query Neo4j graph database."""
-        start = time.time()
+        start = time.perf_counter_ns()
         try:
             # Use async method directly
             result = await graph_db_tool._async_search(query)
-            latency = int((time.time() - start) * 1000)
+            latency = (time.perf_counter_ns() - start) // 1_000_000
             
             # Determine confidence based on result quality
             confidence = 0.9 if "Fact:" in result else 0.5
@@ -152,14 +193,14 @@ class MultiContextProcessor:
     
     async def _query_cypher(self, query: str) -> ContextResult:
         """Execute Cypher query for complex traversals."""
-        start = time.time()
+        start = time.perf_counter_ns()
         try:
             # Convert natural language to Cypher query intent
             cypher_query = self._generate_cypher_query(query)
             
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, cypher_query_tool._run, cypher_query)
-            latency = int((time.time() - start) * 1000)
+            # Native async driver; it lives on the tool loop, so await it there
+            result = await run_on_tool_loop_async(cypher_query_tool._arun(cypher_query))
+            latency = (time.perf_counter_ns() - start) // 1_000_000
             
             confidence = 0.8 if result and "No matching" not in result else 0.3
             
@@ -181,11 +222,10 @@ class MultiContextProcessor:
     
     async def _query_web(self, query: str) -> ContextResult:
         """Search external web sources."""
-        start = time.time()
+        start = time.perf_counter_ns()
         try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, web_search_tool._run, query)
-            latency = int((time.time() - start) * 1000)
+            result = await asyncio.get_running_loop().run_in_executor(_POOL, web_search_tool._run, query)
+            latency = (time.perf_counter_ns() - start) // 1_000_000
             
             confidence = 0.7  # Web sources are less reliable
             
@@ -210,11 +250,11 @@ class MultiContextProcessor:
         contexts = ['graph_db']  # Always use graph
         
         # Add Cypher for complex queries
-        if any(word in query.lower() for word in ['interact', 'all', 'contraindicate', 'together', 'and']):
+        if _CYPHER_HINT.search(query):
             contexts.append('cypher')
         
         # Add web for latest info or rare drugs
-        if any(word in query.lower() for word in ['latest', 'new', 'recent', 'study', 'research']):
+        if _WEB_HINT.search(query):
             contexts.append('web')
         
         return contexts
@@ -238,15 +278,22 @@ class MultiContextProcessor:
         if not contexts:
             return "No information found from any source."
         
+        useful = [ctx for ctx in contexts if ctx.content]
+        if not useful:
+            return "No useful information retrieved."
+        
+        # Nothing to synthesize with a single source (or sources that agree
+        # verbatim): return the best one instead of paying for an LLM call
+        if len(useful) == 1 or len({ctx.content[:200] for ctx in useful}) == 1:
+            best = max(useful, key=lambda ctx: ctx.confidence)
+            return f"**{best.source.upper()}** (confidence {best.confidence:.0%}):\n{best.content}"
+        
         # Build context summary
         context_summary = "\n\n".join([
             f"**Source: {ctx.source.upper()}** (Confidence: {ctx.confidence:.0%}, Latency: {ctx.latency_ms}ms)\n{ctx.content}"
-            for ctx in contexts if ctx.content
+            for ctx in useful
         ])
         
-        if not context_summary:
-            return "No useful information retrieved."
-        
         # Merge using LLM
         merge_prompt = f"""You are a medical information synthesizer.
 
@@ -265,16 +312,16 @@ Task: Synthesize the above information into a coherent, accurate answer.
 Synthesized Answer:"""
 
         try:
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, 
-                lambda: self.merger_llm.call([{"role": "user", "content": merge_prompt}])
-            )
-            return response
+            return await asyncio.get_running_loop().run_in_executor(_POOL, self._call_merger, merge_prompt)
         except Exception as e:
             logger.error(f"LLM merge error: {e}")
             # Fallback: just concatenate
             return f"Multiple sources retrieved:\n\n{context_summary}"
+    
+    def _call_merger(self, prompt: str) -> str:
+        """Blocking merge LLM call (runs on the MCP pool)."""
+        with get_groq_limiter():
+            return self.merger_llm.call([{"role": "user", "content": prompt}])
 
 
 # Global instance
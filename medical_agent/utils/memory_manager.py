@@ -1,23 +1,155 @@
 """
 Memory Manager for Medical Chatbot using LangChain
-Provides conversation history and context using in-memory storage
+Provides conversation history and context using in-memory storage,
+or Redis when REDIS_URL is set (shared across workers, survives restarts)
 """
 
-from typing import List, Dict, Optional, Any
-from datetime import datetime
-import hashlib
+from collections import deque
+from itertools import islice
+from typing import List, Dict, Optional, Any, Sequence
+import secrets
+import threading
 
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_groq import ChatGroq
+import orjson
+from cachetools import TTLCache
+
+from langchain_community.chat_message_histories import RedisChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, message_to_dict, messages_from_dict
+from crewai import LLM
 from medical_agent.config import Config
+from medical_agent.graph.groq_client import get_groq_limiter
+
+
+SESSION_KEY_PREFIX = "medical_session:"
+SESSION_COUNT_PREFIX = "medical_session_count:"  # Messages ever added (the list is trimmed)
+
+
+# Redis client shared by all sessions (one connection pool per process)
+_redis_client = None
+
+def get_redis_client():
+    """Get or create the shared Redis client (requires REDIS_URL)."""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(Config.REDIS_URL)
+    return _redis_client
+
+
+# Summarization LLM shared by all sessions (created on first summary)
+_summary_llm = None
+
+def get_summary_llm() -> LLM:
+    """Get or create the shared summarization LLM."""
+    global _summary_llm
+    if _summary_llm is None:
+        _summary_llm = LLM(
+            model="groq/llama-3.3-70b-versatile",
+            api_key=Config.GROQ_API_KEY,
+            temperature=0.0
+        )
+    return _summary_llm
+
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """
+    In-memory chat history backed by a deque(maxlen=max_messages).
+    
+    Appends are O(1) and the oldest messages drop off automatically;
+    recent() reads the newest messages without copying the whole history.
+    """
+    
+    def __init__(self, max_messages: int):
+        self._messages: deque = deque(maxlen=max_messages)
+        self.total_added = 0  # Messages ever added (the deque forgets old ones)
+        # Context is read in worker threads while exchanges are appended on
+        # the event loop; iterating a deque during an append raises
+        self._lock = threading.Lock()
+    
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            return list(self._messages)
+    
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            self._messages.extend(messages)
+            self.total_added += len(messages)
+    
+    def recent(self, limit: int) -> List[BaseMessage]:
+        """The newest ``limit`` messages, oldest first."""
+        with self._lock:
+            return list(islice(reversed(self._messages), limit))[::-1]
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._messages.clear()
+            self.total_added = 0
+
+
+class BoundedRedisChatMessageHistory(RedisChatMessageHistory):
+    """
+    Redis chat history trimmed to the newest ``max_messages``.
+    
+    A write is one pipelined round-trip (LPUSH + LTRIM + counter + EXPIRE)
+    and reads fetch only the head of the list instead of the whole history.
+    """
+    
+    def __init__(self, session_id: str, max_messages: int, ttl: Optional[int] = None):
+        # Not calling super().__init__: it opens a client per session, while
+        # all sessions share one pool here. The attributes it sets are the same.
+        self.redis_client = get_redis_client()
+        self.session_id = session_id
+        self.key_prefix = SESSION_KEY_PREFIX
+        self.ttl = ttl
+        self.max_messages = max_messages
+    
+    @property
+    def count_key(self) -> str:
+        return SESSION_COUNT_PREFIX + self.session_id
+    
+    @property
+    def total_added(self) -> int:
+        """Messages ever added to this session (the list forgets old ones)."""
+        return int(self.redis_client.get(self.count_key) or 0)
+    
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.recent(self.max_messages)
+    
+    def recent(self, limit: int) -> List[BaseMessage]:
+        """The newest ``limit`` messages, oldest first (newest are at the list head)."""
+        items = self.redis_client.lrange(self.key, 0, limit - 1)
+        return messages_from_dict([orjson.loads(item) for item in reversed(items)])
+    
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+    
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.lpush(self.key, *(orjson.dumps(message_to_dict(m)) for m in messages))
+        pipe.ltrim(self.key, 0, self.max_messages - 1)
+        pipe.incrby(self.count_key, len(messages))
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+            pipe.expire(self.count_key, self.ttl)
+        pipe.execute()
+    
+    def exists(self) -> bool:
+        return bool(self.redis_client.exists(self.key))
+    
+    def clear(self) -> None:
+        self.redis_client.delete(self.key, self.count_key)
 
 
 class MedicalConversationMemory:
     """
     Conversation memory for medical chatbot using LangChain.
     Features:
-    - Session-based conversation history (in-memory)
+    - Session-based conversation history (in-memory or Redis)
     - Context-aware memory retrieval
     - Automatic summarization for long conversations
     """
@@ -26,20 +158,22 @@ class MedicalConversationMemory:
         self.session_id = session_id or self._generate_session_id()
         self.max_messages = max_messages
         
-        # Initialize simple in-memory chat history
-        self.chat_history = ChatMessageHistory()
+        # Redis-backed history expires idle sessions after SESSION_TTL;
+        # otherwise use bounded in-memory chat history
+        if Config.REDIS_URL:
+            self.chat_history = BoundedRedisChatMessageHistory(
+                self.session_id, max_messages, ttl=Config.SESSION_TTL
+            )
+        else:
+            self.chat_history = BoundedChatMessageHistory(max_messages)
         
-        # Initialize LLM for summarization
-        self.llm = ChatGroq(
-            api_key=Config.GROQ_API_KEY,
-            model_name="llama-3.3-70b-versatile",
-            temperature=0.0
-        )
+        # Rolling summary: the last summary and how many messages it covers
+        self._summary_cache = ""
+        self._summarized_up_to = 0
     
     def _generate_session_id(self) -> str:
-        """Generate unique session ID."""
-        timestamp = datetime.now().isoformat()
-        return hashlib.md5(timestamp.encode()).hexdigest()[:16]
+        """Generate unique session ID (random, so concurrent sessions never collide)."""
+        return secrets.token_hex(8)
     
     def add_user_message(self, message: str):
         """Add user message to memory."""
@@ -49,11 +183,17 @@ class MedicalConversationMemory:
         """Add AI response to memory."""
         self.chat_history.add_message(AIMessage(content=message))
     
+    def add_exchange(self, user_message: str, ai_message: str):
+        """Add a user message and the AI response in one history write."""
+        self.chat_history.add_messages([
+            HumanMessage(content=user_message),
+            AIMessage(content=ai_message)
+        ])
+    
     def get_conversation_history(self, limit: int = None) -> List[Dict[str, str]]:
         """Get formatted conversation history."""
-        messages = self.chat_history.messages
-        if limit:
-            messages = messages[-limit:]
+        # Both history backends can read just the newest messages
+        messages = self.chat_history.recent(limit) if limit else self.chat_history.messages
         
         history = []
         for msg in messages:
@@ -69,47 +209,76 @@ class MedicalConversationMemory:
         Get relevant context from conversation history for current query.
         Returns formatted context string for agent.
         """
-        history = self.get_conversation_history(limit=self.max_messages)
+        history = self.get_conversation_history(limit=5)  # Last 5 messages for immediate context
         
         if not history:
             return ""
         
         # Format context
         context_parts = ["## Previous Conversation Context:"]
-        for msg in history[-5:]:  # Last 5 messages for immediate context
+        for msg in history:
             role = "User" if msg["role"] == "user" else "Assistant"
             context_parts.append(f"{role}: {msg['content']}")
         
         return "\n".join(context_parts)
     
     def get_summary(self) -> str:
-        """Get conversation summary for long conversations."""
-        messages = self.memory.chat_memory.messages
-        if len(messages) < 10:
+        """
+        Get conversation summary for long conversations.
+        
+        The summary is rolled forward: only messages added since the last
+        summary are sent, together with that summary, instead of the whole
+        history on every call.
+        """
+        messages = self.chat_history.messages
+        # Position in the full conversation (bounded history drops old messages)
+        total = self.chat_history.total_added
+        if total < 10:
             return ""
+        if total < self._summarized_up_to:
+            # History shrank (cleared or trimmed elsewhere): start over
+            self._summary_cache, self._summarized_up_to = "", 0
+        if self._summarized_up_to == total:
+            return self._summary_cache
         
         # Create summary using LLM
+        new_count = min(total - self._summarized_up_to, len(messages))
         conversation_text = "\n".join([
             f"{'User' if msg.type == 'human' else 'Assistant'}: {msg.content}"
-            for msg in messages
+            for msg in messages[-new_count:]
         ])
         
+        if self._summary_cache:
+            source = f"""Previous summary:
+{self._summary_cache}
+
+New messages:
+{conversation_text}
+
+Updated summary:"""
+        else:
+            source = f"""Conversation:
+{conversation_text}
+
+Summary:"""
+        
         summary_prompt = f"""Summarize this medical conversation in 2-3 sentences, focusing on:
 - Main medical topics discussed
 - Key medications or conditions mentioned
 - Important warnings or recommendations given
 
-Conversation:
-{conversation_text}
-
-Summary:"""
+{source}"""
         
-        response = self.llm.invoke([HumanMessage(content=summary_prompt)])
-        return response.content
+        with get_groq_limiter():
+            self._summary_cache = get_summary_llm().call([{"role": "user", "content": summary_prompt}])
+        self._summarized_up_to = total
+        return self._summary_cache
     
     def clear(self):
         """Clear conversation memory."""
         self.chat_history.clear()
+        self._summary_cache = ""
+        self._summarized_up_to = 0
     
     def get_memory_stats(self) -> Dict[str, Any]:
         """Get memory statistics."""
@@ -126,10 +295,17 @@ Summary:"""
 class MemoryManager:
     """
     Global memory manager for handling multiple conversation sessions.
-    All sessions are stored in-memory only (no disk persistence).
+    Sessions live in-memory, or in Redis when REDIS_URL is configured
+    (the local cache then only holds per-session wrappers, and sessions
+    created by other workers are found in Redis). Either way the
+    local cache is bounded to MAX_SESSIONS and drops sessions idle for
+    longer than SESSION_TTL, so abandoned sessions don't accumulate.
     """
     
-    _sessions: Dict[str, MedicalConversationMemory] = {}
+    _sessions: TTLCache = TTLCache(maxsize=Config.MAX_SESSIONS, ttl=Config.SESSION_TTL)
+    # TTLCache is not thread-safe: /ask and the sweeper use it on the event
+    # loop while the sync /sessions endpoints run in the threadpool
+    _lock = threading.Lock()
     
     @classmethod
     def get_session(cls, session_id: str = None) -> MedicalConversationMemory:
@@ -137,30 +313,58 @@ class MemoryManager:
         if session_id is None:
             # Create new session with unique ID
             new_memory = MedicalConversationMemory()
-            session_id = new_memory.session_id
-            cls._sessions[session_id] = new_memory
+            with cls._lock:
+                cls._sessions[new_memory.session_id] = new_memory
             return new_memory
         
-        if session_id not in cls._sessions:
-            cls._sessions[session_id] = MedicalConversationMemory(session_id)
-        
-        return cls._sessions[session_id]
+        with cls._lock:
+            memory = cls._sessions.get(session_id)
+            if memory is None:
+                memory = MedicalConversationMemory(session_id)
+            # Re-assign on every access: TTLCache only restarts the timer on writes
+            cls._sessions[session_id] = memory
+        return memory
     
     @classmethod
     def delete_session(cls, session_id: str):
         """Delete a conversation session."""
-        if session_id in cls._sessions:
-            cls._sessions[session_id].clear()
-            del cls._sessions[session_id]
+        with cls._lock:
+            memory = cls._sessions.pop(session_id, None)
+        if memory is None and Config.REDIS_URL:
+            # Possibly created by another worker: clear it in Redis anyway
+            memory = MedicalConversationMemory(session_id)
+        if memory is not None:
+            memory.clear()
+    
+    @classmethod
+    def expire_sessions(cls):
+        """Drop idle sessions now instead of waiting for the next cache write."""
+        with cls._lock:
+            cls._sessions.expire()
     
     @classmethod
     def list_sessions(cls) -> List[str]:
         """List all active session IDs."""
-        return list(cls._sessions.keys())
+        if Config.REDIS_URL:
+            prefix_len = len(SESSION_KEY_PREFIX)
+            return [
+                key.decode()[prefix_len:]
+                for key in get_redis_client().scan_iter(match=f"{SESSION_KEY_PREFIX}*")
+            ]
+        with cls._lock:
+            return list(cls._sessions.keys())
     
     @classmethod
     def get_session_summary(cls, session_id: str) -> Optional[str]:
         """Get summary for a specific session."""
-        if session_id not in cls._sessions:
+        with cls._lock:
+            memory = cls._sessions.get(session_id)
+        if memory is None and Config.REDIS_URL:
+            # Sessions created by other workers are only in Redis
+            stored = MedicalConversationMemory(session_id)
+            if stored.chat_history.exists():
+                with cls._lock:
+                    memory = cls._sessions.setdefault(session_id, stored)
+        if memory is None:
             return None
-        return cls._sessions[session_id].get_summary()
+        return memory.get_summary()
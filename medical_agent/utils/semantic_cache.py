@@ -0,0 +1,183 @@
+"""
+Semantic Response Cache
+Returns stored answers for paraphrased queries using embedding similarity (FAISS)
+"""
+
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from medical_agent.config import Config
+from medical_agent.graph.client import get_embedder
+
+
+# Paraphrases that differ in these terms need different answers ("ibuprofen
+# dose for adults" vs "...for children"), however close their embeddings are
+_TERM = re.compile(r"\d+(?:\.\d+)?|[a-z]+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_DRUG_NAMES = frozenset({
+    "aspirin", "ibuprofen", "acetaminophen", "paracetamol", "tylenol", "advil", "motrin",
+    "naproxen", "aleve", "diclofenac", "celecoxib", "warfarin", "coumadin", "heparin",
+    "clopidogrel", "apixaban", "rivaroxaban", "metformin", "insulin", "lisinopril",
+    "amlodipine", "losartan", "metoprolol", "atorvastatin", "simvastatin", "omeprazole",
+    "pantoprazole", "amoxicillin", "azithromycin", "ciprofloxacin", "doxycycline",
+    "prednisone", "levothyroxine", "sertraline", "fluoxetine", "citalopram", "alprazolam",
+    "diazepam", "gabapentin", "tramadol", "morphine", "codeine", "oxycodone", "cetirizine",
+    "loratadine", "salbutamol", "albuterol", "furosemide", "hydrochlorothiazide", "digoxin",
+    "alcohol", "nsaid", "nsaids"
+})
+_POPULATIONS = {
+    "child": "child", "children": "child", "kid": "child", "kids": "child",
+    "pediatric": "child", "paediatric": "child", "toddler": "child",
+    "infant": "infant", "infants": "infant", "baby": "infant", "babies": "infant", "newborn": "infant",
+    "teen": "teen", "teens": "teen", "teenager": "teen", "adolescent": "teen",
+    "adult": "adult", "adults": "adult",
+    "elderly": "elderly", "senior": "elderly", "seniors": "elderly",
+    "pregnant": "pregnancy", "pregnancy": "pregnancy", "breastfeeding": "breastfeeding"
+}
+
+_SEARCH_K = 4  # Neighbours checked for one with matching key terms
+
+
+def key_terms(query: str) -> FrozenSet[str]:
+    """Drug names, numbers and patient groups a cached answer is specific to."""
+    terms = set()
+    for term in _TERM.findall(query.lower()):
+        if term in _DRUG_NAMES or _NUMBER.fullmatch(term):
+            terms.add(term)
+        elif term in _POPULATIONS:
+            terms.add(_POPULATIONS[term])
+    return frozenset(terms)
+
+
+@dataclass
+class CacheEntry:
+    """A cached response, the key terms of its query and its usage statistics."""
+    response: str
+    mode: str
+    frequency: int
+    last_access: float
+    key_terms: FrozenSet[str] = frozenset()
+
+
+class SemanticCache:
+    """
+    Embedding-based response cache.
+
+    Queries are embedded with the shared all-MiniLM-L6-v2 model and searched
+    with an inner-product FAISS index over L2-normalized vectors (i.e. cosine
+    similarity). When full, the entry with the lowest eviction score
+    ψ = 0.6·frequency + 0.4·exp(-age/β) is dropped.
+
+    A hit also requires the same ``key_terms`` (drugs, numbers, patient
+    groups) as the stored query, so near-duplicates that change a drug or a
+    dose are not answered from the cache.
+
+    With ``quantize=True`` vectors are stored as 8-bit scalar-quantized codes
+    (4× smaller, SIMD int8 scoring) instead of float32.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        max_size: int = 500,
+        recency_half_life: float = 3600.0,
+        quantize: bool = False
+    ):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.beta = recency_half_life
+        self.embedder = get_embedder()
+
+        dimension = self.embedder.model.get_sentence_embedding_dimension()
+        self.index = faiss.IndexIDMap2(self._build_index(dimension, quantize))
+        self.entries: Dict[int, CacheEntry] = {}
+        self._next_id = 0
+
+    @staticmethod
+    def _build_index(dimension: int, quantize: bool) -> faiss.Index:
+        """Exact inner-product index, optionally over 8-bit quantized codes."""
+        if not quantize:
+            return faiss.IndexFlatIP(dimension)
+        index = faiss.IndexScalarQuantizer(
+            dimension, faiss.ScalarQuantizer.QT_8bit_uniform, faiss.METRIC_INNER_PRODUCT
+        )
+        # Components of unit vectors lie in [-1, 1]: train the uniform range on
+        # those bounds so no data is needed before the first insert
+        index.train(np.array([[-1.0] * dimension, [1.0] * dimension], dtype=np.float32))
+        return index
+
+    def embed(self, query: str) -> np.ndarray:
+        """Embed a query as a normalized float32 row vector."""
+        return self.normalize(self.embedder.embed(query))  # memoized, read-only
+
+    @staticmethod
+    def normalize(embedding: np.ndarray) -> np.ndarray:
+        """L2-normalize an embedding into the (1, D) float32 row the index expects."""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        return embedding / np.linalg.norm(embedding)
+
+    def search(
+        self, embedding: np.ndarray, terms: FrozenSet[str] = frozenset()
+    ) -> Optional[Tuple[CacheEntry, float]]:
+        """Return the closest cached entry with matching key terms, if above threshold."""
+        if not self.entries:
+            return None
+
+        scores, ids = self.index.search(embedding, min(_SEARCH_K, len(self.entries)))
+        for score, entry_id in zip(scores[0].tolist(), ids[0].tolist()):
+            if score < self.threshold:
+                break  # results are sorted by similarity
+            entry = self.entries.get(entry_id)
+            if entry is None or entry.key_terms != terms:
+                continue
+            entry.frequency += 1
+            entry.last_access = time.monotonic()
+            return entry, score
+        return None
+
+    def add(self, embedding: np.ndarray, response: str, mode: str, terms: FrozenSet[str] = frozenset()):
+        """Store a response, evicting the lowest-scoring entry if full."""
+        if len(self.entries) >= self.max_size:
+            self._evict()
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self.index.add_with_ids(embedding, np.array([entry_id], dtype=np.int64))
+        self.entries[entry_id] = CacheEntry(
+            response=response,
+            mode=mode,
+            frequency=1,
+            last_access=time.monotonic(),
+            key_terms=terms
+        )
+
+    def _evict(self):
+        """Drop the entry with the lowest ψ(d) = 0.6·freq + 0.4·exp(-t/β)."""
+        now = time.monotonic()
+        victim = min(
+            self.entries,
+            key=lambda i: 0.6 * self.entries[i].frequency
+            + 0.4 * math.exp(-(now - self.entries[i].last_access) / self.beta)
+        )
+        self.index.remove_ids(np.array([victim], dtype=np.int64))
+        del self.entries[victim]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# Global semantic cache instance (singleton)
+_semantic_cache = None
+
+def get_semantic_cache() -> SemanticCache:
+    """Get or create global semantic cache instance."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache(quantize=Config.SEMANTIC_CACHE_INT8)
+    return _semantic_cache
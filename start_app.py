@@ -18,15 +18,13 @@ from pathlib import Path
 def check_neo4j():
     """Check if Neo4j is accessible."""
     try:
-        from neo4j import GraphDatabase
-        from medical_agent.config import Config
+        from medical_agent.graph.driver import get_driver, close_driver
         
-        driver = GraphDatabase.driver(
-            Config.NEO4J_URI,
-            auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD)
-        )
-        driver.verify_connectivity()
-        driver.close()
+        # The server queries through the async driver, so don't keep this pool open
+        try:
+            get_driver().verify_connectivity()
+        finally:
+            close_driver()
         print("✅ Neo4j is running")
         return True
     except Exception as e:
@@ -52,6 +50,7 @@ def start_server():
     import uvicorn
     from medical_agent.api.server import app
     
+    # loop/http "auto" pick uvloop and httptools when installed (uvicorn[standard])
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
 def main():
@@ -2,44 +2,65 @@
 Test script for intelligent routing and tool diversity.
 """
 
+import asyncio
+import io
+import sys
+
 from medical_agent.utils.intelligent_router import get_router
 from medical_agent.agents.crew import create_medical_crew
 
-def test_query(query: str):
-    """Test a query with intelligent routing."""
-    print(f"\n{'='*80}")
-    print(f"TESTING QUERY: '{query}'")
-    print(f"{'='*80}\n")
+def test_query(query: str, out=None):
+    """Test a query with intelligent routing, writing the report to ``out``."""
+    print(f"\n{'='*80}", file=out)
+    print(f"TESTING QUERY: '{query}'", file=out)
+    print(f"{'='*80}\n", file=out)
     
     # Step 1: Analyze with LLM router
     router = get_router()
     analysis = router.analyze_query(query)
     
-    print(f"📊 ANALYSIS RESULTS:")
-    print(f"   Medical: {analysis.is_medical} (confidence: {analysis.confidence:.2f})")
-    print(f"   Intent: {analysis.intent}")
-    print(f"   Complexity: {analysis.complexity}/5")
-    print(f"   Required Agents: {', '.join(analysis.required_agents)}")
-    print(f"   Max Iterations: {analysis.max_iterations}")
-    print(f"   Suggested Tools: {', '.join(analysis.suggested_tools)}")
-    print(f"   Reasoning: {analysis.reasoning}")
+    print(f"📊 ANALYSIS RESULTS:", file=out)
+    print(f"   Medical: {analysis.is_medical} (confidence: {analysis.confidence:.2f})", file=out)
+    print(f"   Intent: {analysis.intent}", file=out)
+    print(f"   Complexity: {analysis.complexity}/5", file=out)
+    print(f"   Required Agents: {', '.join(analysis.required_agents)}", file=out)
+    print(f"   Max Iterations: {analysis.max_iterations}", file=out)
+    print(f"   Suggested Tools: {', '.join(analysis.suggested_tools)}", file=out)
+    print(f"   Reasoning: {analysis.reasoning}", file=out)
     
     if not analysis.is_medical:
-        print(f"\n❌ REJECTED: {analysis.rejection_message}")
+        print(f"\n❌ REJECTED: {analysis.rejection_message}", file=out)
         return
     
     # Step 2: Create optimized crew
-    print(f"\n🚀 CREATING CREW...")
+    print(f"\n🚀 CREATING CREW...", file=out)
     crew = create_medical_crew(query, analysis)
     
     # Step 3: Execute
-    print(f"\n⚡ EXECUTING...")
+    print(f"\n⚡ EXECUTING...", file=out)
     result = crew.kickoff()
     
-    print(f"\n✅ RESULT:")
-    print(f"{result.raw if hasattr(result, 'raw') else result}")
+    print(f"\n✅ RESULT:", file=out)
+    print(f"{result.raw if hasattr(result, 'raw') else result}", file=out)
     
-    print(f"\n{'='*80}\n")
+    print(f"\n{'='*80}\n", file=out)
+
+
+def _run_buffered(query: str) -> str:
+    """Run one test case and return its report, so concurrent cases don't interleave."""
+    out = io.StringIO()
+    test_query(query, out)
+    return out.getvalue()
+
+
+async def main(test_cases):
+    # The cases are independent: run them concurrently and print the reports
+    # in order once all have finished
+    reports = await asyncio.gather(
+        *(asyncio.to_thread(_run_buffered, query) for query in test_cases)
+    )
+    sys.stdout.write("".join(reports))
+    sys.stdout.flush()
 
 
 if __name__ == "__main__":
@@ -51,8 +72,4 @@ if __name__ == "__main__":
         "can I take aspirin with warfarin",  # Complex query - 3 agents
     ]
     
-    for query in test_cases:
-        test_query(query)
-        print("\n" + "="*80)
-        print("Press Enter to continue to next test...")
-        input()
+    asyncio.run(main(test_cases))